@@ -16,37 +16,47 @@ import os
 import json
 import time
 import logging
+from datetime import datetime
+from functools import lru_cache
+from importlib import import_module
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List, Set, Tuple
 
-# Add src directory to path for imports
-sys.path.insert(0, str(Path(__file__).parent / "src"))
+from src import prompt_cache
+from src.log_setup import setup_logging, stop_logging
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the standard library encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
 
 # Available image generation services and their modules
 IMAGE_SERVICES = {
     "mock": {
-        "module": "mock_image_alteration",
+        "module": "src.mock_image_alteration",
         "function": "mock_image_automation",
         "description": "Mock automation using PIL transformations (always works)",
         "requires_input": True,
         "generates_new": True
     },
     "bing": {
-        "module": "bing_image_alteration", 
+        "module": "src.bing_image_alteration", 
         "function": "bing_image_automation",
         "description": "Bing Image Creator automation",
         "requires_input": False,
         "generates_new": True
     },
     "craiyon": {
-        "module": "craiyon_image_alteration",
+        "module": "src.craiyon_image_alteration",
         "function": "craiyon_image_automation", 
         "description": "Craiyon (DALL-E mini) automation",
         "requires_input": False,
         "generates_new": True
     },
     "deepai": {
-        "module": "deepai_image_alteration",
+        "module": "src.deepai_image_alteration",
         "function": "deepai_retry_automation",
         "description": "DeepAI Text-to-Image automation (confirmed working)",
         "requires_input": False,
@@ -57,29 +67,32 @@ IMAGE_SERVICES = {
 # Available chat completion services and their modules
 CHAT_SERVICES = {
     "openai": {
-        "module": "openai_chat_completion",
+        "module": "src.openai_chat_completion",
         "function": "openai_chat_automation",
+        "fast_path": "openai_chat_fast_path",
         "description": "OpenAI ChatGPT web interface automation",
         "requires_input": False,
         "generates_text": True
     },
     "claude": {
-        "module": "claude_chat_completion",
+        "module": "src.claude_chat_completion",
         "function": "claude_chat_automation",
+        "fast_path": "claude_chat_fast_path",
         "description": "Anthropic Claude web interface automation",
         "requires_input": False,
         "generates_text": True
     },
     "gemini": {
-        "module": "gemini_chat_completion",
+        "module": "src.gemini_chat_completion",
         "function": "gemini_chat_automation",
         "description": "Google Gemini web interface automation",
         "requires_input": False,
         "generates_text": True
     },
     "perplexity": {
-        "module": "perplexity_chat_completion",
+        "module": "src.perplexity_chat_completion",
         "function": "perplexity_chat_automation",
+        "fast_path": "perplexity_chat_fast_path",
         "description": "Perplexity AI web interface automation",
         "requires_input": False,
         "generates_text": True
@@ -91,71 +104,125 @@ DEFAULT_OUTPUT_DIR = "./data/output/"
 DEFAULT_PROMPT = "anthropomorphize these animals"
 DEFAULT_SERVICE = "deepai"
 DEFAULT_MODE = "image"
+DEFAULT_MAX_CONCURRENCY = 3
+
+# Paths parsed once at import instead of on every run
+_LOG_DIR = Path("./data/logs")
+_DEFAULT_INPUT_PATH = Path(DEFAULT_INPUT)
+_DEFAULT_OUTPUT_PATH = Path(DEFAULT_OUTPUT_DIR)
+
+# Output file extensions reported for each mode
+_IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png"})
+_TEXT_EXTENSIONS = frozenset({".txt"})
+
+# Module providing the Chromium instance shared by every browser-driven runner
+BROWSER_POOL_MODULE = "src.browser_pool"
+
+# Resolved automation callables keyed by (module, function)
+_IMPORT_CACHE: Dict[Tuple[str, str], Callable] = {}
+
+def cached_import(module_name: str, item_name: str) -> Callable:
+    """Import a service module once and memoize the requested attribute"""
+    key = (module_name, item_name)
+    try:
+        return _IMPORT_CACHE[key]
+    except KeyError:
+        pass
+    
+    module = sys.modules.get(module_name) or import_module(module_name)
+    item = getattr(module, item_name)
+    _IMPORT_CACHE[key] = item
+    return item
+
+@lru_cache(maxsize=None)
+def _default_input_exists() -> bool:
+    """Check for the default input image once per process"""
+    return _DEFAULT_INPUT_PATH.exists()
+
+def resolve_service(service_info: Dict[str, Any]) -> Callable:
+    """Return the automation callable for a registry entry, resolving it on first access"""
+    automation_function = service_info.get("callable")
+    if automation_function is None:
+        automation_function = cached_import(service_info["module"], service_info["function"])
+        service_info["callable"] = automation_function
+    return automation_function
+
+def resolve_fast_path(service_info: Dict[str, Any]) -> Optional[Callable]:
+    """Return the entry's browserless fast path (cache or API), or None when it has none"""
+    fast_path_name = service_info.get("fast_path")
+    if fast_path_name is None:
+        return None
+    return cached_import(service_info["module"], fast_path_name)
 
 class AutomationRunner:
     """Main runner class for both image generation and text completion automation"""
     
+    __slots__ = ("service", "mode", "input_file", "output_dir", "prompt", "session_log",
+                 "_services", "_service_info")
+    
+    # Output directories already created by this process
+    _mkdir_cache: Set[Path] = set()
+    
     def __init__(self, service: str, mode: str = DEFAULT_MODE, input_file: Optional[str] = None, 
                  output_dir: str = DEFAULT_OUTPUT_DIR, prompt: Optional[str] = None):
         self.service = service
         self.mode = mode
         self.input_file = Path(input_file) if input_file else None
-        self.output_dir = Path(output_dir)
+        if output_dir == DEFAULT_OUTPUT_DIR:
+            self.output_dir = _DEFAULT_OUTPUT_PATH
+        else:
+            self.output_dir = output_dir if isinstance(output_dir, Path) else Path(output_dir)
         self.prompt = prompt or DEFAULT_PROMPT
         self.session_log = []
+        self._services = IMAGE_SERVICES if mode == "image" else CHAT_SERVICES
+        self._service_info = self._services.get(service)
         
-        # Ensure output directory exists
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Ensure output directory exists (once per path)
+        if self.output_dir not in AutomationRunner._mkdir_cache:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            AutomationRunner._mkdir_cache.add(self.output_dir)
+    
+    def _is_mock(self) -> bool:
+        """Whether the selected service is the browserless mock service"""
+        return self.mode == "image" and self.service == "mock"
         
     def validate_service(self) -> bool:
         """Validate that the requested service is available"""
-        available_services = IMAGE_SERVICES if self.mode == "image" else CHAT_SERVICES
-        
-        if self.service not in available_services:
-            logging.error(f"Service '{self.service}' not available for {self.mode} mode.")
-            logging.info(f"Available {self.mode} services: {', '.join(available_services.keys())}")
+        if self._service_info is None:
+            logger.error("Service '%s' not available for %s mode.", self.service, self.mode)
+            logger.info("Available %s services: %s", self.mode, ', '.join(self._services.keys()))
             return False
         return True
     
     def validate_input(self) -> bool:
         """Validate input file if required"""
-        available_services = IMAGE_SERVICES if self.mode == "image" else CHAT_SERVICES
-        service_info = available_services[self.service]
-        
-        if self.mode == "image" and service_info.get("requires_input", False):
+        if self.mode == "image" and self._service_info.get("requires_input", False):
             if not self.input_file or not self.input_file.exists():
-                logging.error(f"Service '{self.service}' requires input file: {self.input_file}")
+                logger.error("Service '%s' requires input file: %s", self.service, self.input_file)
                 return False
-            logging.info(f"Input file validated: {self.input_file}")
+            logger.info("Input file validated: %s", self.input_file)
         else:
             mode_type = "images" if self.mode == "image" else "text responses"
-            logging.info(f"Service '{self.service}' generates {mode_type} from prompt only")
+            logger.info("Service '%s' generates %s from prompt only", self.service, mode_type)
         
         return True
     
     def log_session(self, event: str, details: Dict[str, Any]):
-        """Log session events"""
-        log_entry = {
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "service": self.service,
-            "event": event,
-            "details": details
-        }
-        self.session_log.append(log_entry)
+        """Log session events as (ts_ns, event, details) tuples"""
+        self.session_log.append((time.time_ns(), event, details))
     
     async def run_service(self) -> bool:
         """Run the selected service automation"""
-        available_services = IMAGE_SERVICES if self.mode == "image" else CHAT_SERVICES
-        service_info = available_services[self.service]
+        service_info = self._service_info
         
         try:
-            logging.info(f"Starting {self.service} {self.mode} automation")
-            logging.info(f"Service: {service_info['description']}")
+            logger.info("Starting %s %s automation", self.service, self.mode)
+            logger.info("Service: %s", service_info['description'])
             
             if self.input_file:
-                logging.info(f"Input: {self.input_file}")
-            logging.info(f"Output: {self.output_dir}")
-            logging.info(f"Prompt: {self.prompt}")
+                logger.info("Input: %s", self.input_file)
+            logger.info("Output: %s", self.output_dir)
+            logger.info("Prompt: %s", self.prompt)
             
             self.log_session("automation_start", {
                 "mode": self.mode,
@@ -164,35 +231,26 @@ class AutomationRunner:
                 "prompt": self.prompt
             })
             
-            # Import and run the service module
-            module_name = service_info["module"]
-            function_name = service_info["function"]
-            
-            # Dynamic import
-            module = __import__(module_name, fromlist=[function_name])
-            automation_function = getattr(module, function_name)
+            # Import and run the service module (resolved once per process)
+            automation_function = resolve_service(service_info)
             
             # Execute the automation
             start_time = time.time()
             
-            if self.mode == "image" and self.service == "mock":
+            if self._is_mock():
                 # Mock service needs input file and output dir
                 success = await automation_function(
                     input_file=str(self.input_file) if self.input_file else None,
                     output_dir=str(self.output_dir)
                 )
             else:
-                # All other services need output dir and prompt
-                success = await automation_function(
-                    output_dir=str(self.output_dir),
-                    prompt=self.prompt
-                )
+                success = await self._run_browser_service(service_info, automation_function)
             
             execution_time = time.time() - start_time
             
             if success:
-                logging.info(f"{self.service} {self.mode} automation completed successfully")
-                logging.info(f"Execution time: {execution_time:.2f} seconds")
+                logger.info("%s %s automation completed successfully", self.service, self.mode)
+                logger.info("Execution time: %.2f seconds", execution_time)
                 
                 self.log_session("automation_success", {
                     "execution_time": execution_time,
@@ -201,78 +259,154 @@ class AutomationRunner:
                 
                 return True
             else:
-                logging.error(f"{self.service} {self.mode} automation failed")
+                logger.error("%s %s automation failed", self.service, self.mode)
                 self.log_session("automation_failed", {
                     "execution_time": execution_time
                 })
                 return False
                 
         except Exception as e:
-            logging.error(f"Error running {self.service}: {e}")
+            logger.error("Error running %s: %s", self.service, e)
             self.log_session("automation_error", {
                 "error": str(e),
                 "error_type": type(e).__name__
             })
             return False
     
+    async def _run_browser_service(self, service_info: Dict[str, Any], automation_function: Callable) -> bool:
+        """Try the service's fast path, then run it in a fresh context on the shared browser"""
+        # A cache hit or API answer never launches Chromium
+        fast_path = resolve_fast_path(service_info)
+        if fast_path is not None and await fast_path(output_dir=str(self.output_dir), prompt=self.prompt):
+            return True
+        
+        # Browser services get a fresh context on the shared browser, restored from any saved session
+        new_context = cached_import(BROWSER_POOL_MODULE, "new_context")
+        context = await new_context(site=self.service)
+        try:
+            return await automation_function(
+                output_dir=str(self.output_dir),
+                prompt=self.prompt,
+                context=context
+            )
+        finally:
+            await context.close()
+    
     def _find_output_files(self) -> list:
         """Find output files in the output directory"""
-        output_files = []
-        if self.mode == "image":
-            for pattern in ["*.jpg", "*.png", "*.jpeg"]:
-                output_files.extend(list(self.output_dir.glob(pattern)))
-        else:  # text mode
-            for pattern in ["*.txt"]:
-                output_files.extend(list(self.output_dir.glob(pattern)))
-        return [str(f) for f in output_files]
+        extensions = _IMAGE_EXTENSIONS if self.mode == "image" else _TEXT_EXTENSIONS
+        # Single directory pass instead of one glob per extension
+        with os.scandir(self.output_dir) as entries:
+            return [
+                entry.path for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file()
+            ]
     
     def save_session_log(self):
         """Save session log to file"""
-        log_dir = Path("./data/logs")
-        log_dir.mkdir(parents=True, exist_ok=True)
-        log_file = log_dir / f"session_log_{self.service}_{int(time.time())}.json"
-        with open(log_file, 'w') as f:
-            json.dump(self.session_log, f, indent=2)
-        logging.info(f"Session log saved: {log_file}")
+        _LOG_DIR.mkdir(parents=True, exist_ok=True)
+        log_file = _LOG_DIR / f"session_log_{self.service}_{time.time_ns()}.json"
+        # Entries become dicts (with formatted timestamps) only when saved
+        entries = [
+            {
+                "timestamp": datetime.fromtimestamp(ts_ns / 1e9).isoformat(sep=" ", timespec="seconds"),
+                "service": self.service,
+                "event": event,
+                "details": details
+            }
+            for ts_ns, event, details in self.session_log
+        ]
+        
+        if orjson is not None:
+            payload = orjson.dumps(entries, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(entries, indent=2).encode('utf-8')
+        
+        # Encode once, then hand the whole document to a single write
+        with open(log_file, 'wb', buffering=1 << 16) as f:
+            f.write(payload)
+        logger.info("Session log saved: %s", log_file)
 
-def list_services():
-    """List all available services"""
-    logging.info("Available AI Automation Services:")
-    logging.info("=" * 60)
+async def _run_all(runners: List[AutomationRunner], max_concurrency: int) -> List[bool]:
+    """Run several automation runners concurrently, at most max_concurrency at a time"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_bounded(runner: AutomationRunner) -> bool:
+        async with semaphore:
+            return await runner.run_service()
     
-    logging.info("\nIMAGE GENERATION SERVICES:")
+    results = await asyncio.gather(*(run_bounded(r) for r in runners), return_exceptions=True)
+    for runner, result in zip(runners, results):
+        if isinstance(result, BaseException):
+            logger.error("Error running %s: %s", runner.service, result)
+    return [result is True for result in results]
+
+def load_prompts(prompts: Optional[List[str]], prompts_file: Optional[str]) -> List[str]:
+    """Collect prompts from the command line and an optional file (one prompt per line)"""
+    collected = list(prompts or [])
+    if prompts_file:
+        with open(prompts_file, encoding='utf-8') as f:
+            collected.extend(line.strip() for line in f if line.strip())
+    return collected or [DEFAULT_PROMPT]
+
+@lru_cache(maxsize=None)
+def _service_banner() -> str:
+    """Build the --list-services text once per process"""
+    lines = [
+        "Available AI Automation Services:",
+        "=" * 60,
+        "",
+        "IMAGE GENERATION SERVICES:"
+    ]
     for service_id, info in IMAGE_SERVICES.items():
         status = "WORKING" if service_id in ["mock", "deepai"] else "PARTIAL"
         input_req = "Input Required" if info.get("requires_input", False) else "Prompt Only"
         
-        logging.info(f"  {service_id.upper()}")
-        logging.info(f"     Status: {status}")
-        logging.info(f"     Type: {input_req}")
-        logging.info(f"     Description: {info['description']}")
+        lines.append(f"  {service_id.upper()}")
+        lines.append(f"     Status: {status}")
+        lines.append(f"     Type: {input_req}")
+        lines.append(f"     Description: {info['description']}")
     
-    logging.info("\nTEXT COMPLETION SERVICES:")
+    lines.append("")
+    lines.append("TEXT COMPLETION SERVICES:")
     for service_id, info in CHAT_SERVICES.items():
-        logging.info(f"  {service_id.upper()}")
-        logging.info(f"     Status: EXPERIMENTAL")
-        logging.info(f"     Type: Prompt Only")
-        logging.info(f"     Description: {info['description']}")
-    
-    logging.info("\nExample usage:")
-    logging.info("   # Image generation")
-    logging.info("   python main.py --mode image --service deepai --prompt 'A robot in space'")
-    logging.info("   python main.py --mode image --service mock --input ./data/input/sample.jpg")
-    logging.info("   # Text completion")
-    logging.info("   python main.py --mode text --service openai --prompt 'Explain AI'")
-    logging.info("   python main.py --mode text --service claude --prompt 'What is machine learning?'")
+        lines.append(f"  {service_id.upper()}")
+        lines.append("     Status: EXPERIMENTAL")
+        lines.append("     Type: Prompt Only")
+        lines.append(f"     Description: {info['description']}")
+    
+    lines.extend([
+        "",
+        "Example usage:",
+        "   # Image generation",
+        "   python main.py --mode image --service deepai --prompt 'A robot in space'",
+        "   python main.py --mode image --service mock --input ./data/input/sample.jpg",
+        "   # Text completion",
+        "   python main.py --mode text --service openai --prompt 'Explain AI'",
+        "   python main.py --mode text --service claude --prompt 'What is machine learning?'"
+    ])
+    return "\n".join(lines) + "\n"
+
+def list_services():
+    """List all available services"""
+    sys.stdout.write(_service_banner())
+    sys.stdout.flush()
 
 def main():
     """Main entry point"""
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    # Fast path: listing services needs neither the argument parser nor logging
+    if any(arg in ("-l", "--list-services") for arg in sys.argv[1:]):
+        list_services()
+        return
+    
+    listener = setup_logging()
+    try:
+        run_cli()
+    finally:
+        stop_logging(listener)
+
+def run_cli():
+    """Parse command line arguments and run the requested automation"""
     parser = argparse.ArgumentParser(
         description="AI Image Generation Automation Suite",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -281,6 +415,7 @@ Examples:
   python main.py --service deepai --prompt "A castle in the clouds"
   python main.py --service mock --input ./data/input/sample-original.jpg
   python main.py --service bing --output ./results/
+  python main.py --service deepai --prompt "A red fox" --prompt "A blue whale"
   python main.py --list-services
         """
     )
@@ -312,8 +447,26 @@ Examples:
     
     parser.add_argument(
         "--prompt", "-p",
-        default=DEFAULT_PROMPT,
-        help=f"Text prompt for image generation (default: '{DEFAULT_PROMPT}')"
+        action="append",
+        help=f"Text prompt for image generation, repeatable to batch prompts (default: '{DEFAULT_PROMPT}')"
+    )
+    
+    parser.add_argument(
+        "--prompts-file",
+        help="File with one prompt per line, batched together with any --prompt values"
+    )
+    
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f"Maximum number of prompts run at the same time (default: {DEFAULT_MAX_CONCURRENCY})"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always query the live service instead of reusing a cached response to the same prompt"
     )
     
     parser.add_argument(
@@ -328,38 +481,61 @@ Examples:
         list_services()
         return
     
-    # Create and run automation
-    runner = AutomationRunner(
-        service=args.service,
-        mode=args.mode,
-        input_file=args.input if args.input != DEFAULT_INPUT or Path(args.input).exists() else None,
-        output_dir=args.output,
-        prompt=args.prompt
-    )
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    
+    if args.no_cache:
+        prompt_cache.disable()
+    
+    prompts = load_prompts(args.prompt, args.prompts_file)
+    if args.input != DEFAULT_INPUT:
+        input_file = args.input
+    else:
+        input_file = DEFAULT_INPUT if _default_input_exists() else None
+    
+    # Create one runner per prompt; batched prompts get their own output subdirectory
+    # so services that write fixed filenames don't overwrite each other
+    runners = []
+    for index, prompt in enumerate(prompts, start=1):
+        output_dir = Path(args.output) / f"prompt-{index}" if len(prompts) > 1 else args.output
+        runners.append(AutomationRunner(
+            service=args.service,
+            mode=args.mode,
+            input_file=input_file,
+            output_dir=output_dir,
+            prompt=prompt
+        ))
     
-    # Validate inputs
-    if not runner.validate_service() or not runner.validate_input():
+    # Validate inputs (service and input file are shared by every runner)
+    if not runners[0].validate_service() or not runners[0].validate_input():
         sys.exit(1)
     
     # Run automation
     try:
-        success = asyncio.run(runner.run_service())
-        runner.save_session_log()
+        # One event loop for the whole batch; follow-up coroutines can reuse it
+        with asyncio.Runner() as loop_runner:
+            try:
+                results = loop_runner.run(_run_all(runners, args.max_concurrency))
+            finally:
+                # Shut the shared browser down on the loop that launched it
+                if BROWSER_POOL_MODULE in sys.modules:
+                    loop_runner.run(cached_import(BROWSER_POOL_MODULE, "close_browser")())
+        for runner in runners:
+            runner.save_session_log()
         
-        if success:
-            completion_type = "Image generation" if runner.mode == "image" else "Text completion"
-            logging.info(f"{completion_type} completed successfully")
-            logging.info(f"Check output directory: {runner.output_dir}")
+        completion_type = "Image generation" if args.mode == "image" else "Text completion"
+        if all(results):
+            logger.info("%s completed successfully", completion_type)
+            logger.info("Check output directory: %s", args.output)
         else:
-            completion_type = "Image generation" if runner.mode == "image" else "Text completion"
-            logging.error(f"{completion_type} failed")
+            logger.error("%s failed for %s of %s prompt(s)", completion_type, results.count(False), len(results))
             sys.exit(1)
             
     except KeyboardInterrupt:
-        logging.warning("Automation interrupted by user")
+        logger.warning("Automation interrupted by user")
         sys.exit(1)
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,3 @@
+"""
+Automation scripts for the AI image generation and text completion services
+"""
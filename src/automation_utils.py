@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Shared Automation Helpers
+Small utilities reused by the browser automation scripts:
+1. Racing a list of candidate selectors against one shared timeout,
+   trying the selector that won last time first
+2. Capturing image bodies the page already downloaded
+3. Blocking heavy resources and trackers that are not needed to reach the prompt box
+4. Writing output files off the event loop
+5. Keeping one page open per site so several prompts reuse it
+6. Racing several downloads and keeping the first usable one
+7. Checking downloaded bytes are a real image from the header alone
+8. Warming up the connection to an image CDN while results are generated
+9. Taking failure screenshots only when PW_DEBUG_SHOTS is set
+10. Retrying timeouts and 5xx errors with exponential backoff and jitter
+11. Navigating only until the response commits, leaving readiness to element waits
+12. Waiting for a streamed reply to stop growing
+13. Sharing one selector-wait budget across the steps of a run
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError, expect
+
+logger = logging.getLogger(__name__)
+
+# Winning selector per site and step, e.g. {"bing": {"input": {"selector": ..., "timestamp": ...}}}
+SELECTOR_CACHE_PATH = Path("./data/selector_cache.json")
+SELECTOR_CACHE_TTL = 7 * 24 * 60 * 60
+CACHED_SELECTOR_TIMEOUT = 2000
+
+# Total time all selector waits of one run may spend; override with PW_SELECTOR_BUDGET_MS
+SELECTOR_BUDGET_MS = int(os.environ.get("PW_SELECTOR_BUDGET_MS", 15000))
+
+# Short on purpose: pages keep loading trackers and fonts long after the prompt box exists
+NAV_COMMIT_TIMEOUT = 8000
+
+# Failure screenshots cost a full raster and encode, so they are opt-in
+DEBUG_SHOTS = bool(os.environ.get("PW_DEBUG_SHOTS"))
+DEBUG_DIR = Path("./debug")
+
+# Requests that only slow down reaching the prompt input
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet"})
+TRACKER_HOSTS = ("googletagmanager", "google-analytics", "doubleclick", "segment", "amplitude", "hotjar")
+
+# Net errors and 5xx statuses are worth another try; anything else (4xx, missing selectors) is not
+_SERVER_ERROR_RE = re.compile(r"\b5\d\d\b|net::ERR_")
+
+_selector_cache = None
+_selector_cache_warned = False
+
+def _warn_selector_cache(action, error):
+    """Log the first selector cache I/O failure; the cache is an optimization, so runs carry on without it"""
+    global _selector_cache_warned
+
+    if not _selector_cache_warned:
+        _selector_cache_warned = True
+        logger.warning("Could not %s selector cache %s: %s", action, SELECTOR_CACHE_PATH, error)
+
+def load_selector_cache():
+    """Return the selector cache, reading it from disk on first use"""
+    global _selector_cache
+
+    if _selector_cache is None:
+        _selector_cache = {}
+        try:
+            with open(SELECTOR_CACHE_PATH, 'r', encoding='utf-8') as f:
+                _selector_cache = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            _warn_selector_cache("read", e)
+        if not isinstance(_selector_cache, dict):
+            _warn_selector_cache("read", "not a JSON object")
+            _selector_cache = {}
+    return _selector_cache
+
+def save_selector_cache():
+    """Write the selector cache back to disk"""
+    try:
+        SELECTOR_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(SELECTOR_CACHE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(load_selector_cache(), f, indent=2)
+    except OSError as e:
+        _warn_selector_cache("write", e)
+
+def cached_selector(site, step):
+    """Return the selector that last won for a site step, unless it has expired"""
+    entry = load_selector_cache().get(site, {}).get(step)
+    if entry and time.time() - entry.get("timestamp", 0) < SELECTOR_CACHE_TTL:
+        return entry.get("selector")
+    return None
+
+def remember_selector(site, step, selector):
+    """Record the winning selector for a site step, saving only when it changed or expired"""
+    if cached_selector(site, step) == selector:
+        return
+    load_selector_cache().setdefault(site, {})[step] = {"selector": selector, "timestamp": time.time()}
+    save_selector_cache()
+
+async def find_first(page, selectors, timeout=10000, state="visible", cache_key=None, union=None):
+    """Wait for any candidate selector, then return (selector, element) for the earliest-listed match.
+
+    All candidates race against a single timeout instead of each one burning
+    its own. With a (site, step) cache_key, the selector that won last time is
+    tried alone first with a short timeout. Callers with fixed candidate lists
+    can pass their pre-joined union to skip the join. Returns (None, None)
+    when nothing matches in time.
+    """
+    if cache_key is not None:
+        cached = cached_selector(*cache_key)
+        if cached in selectors:
+            try:
+                element = await page.wait_for_selector(cached, state=state, timeout=CACHED_SELECTOR_TIMEOUT)
+                return cached, element
+            except PlaywrightTimeoutError:
+                pass
+
+    if union is None:
+        union = ", ".join(selectors)
+    try:
+        element = await page.wait_for_selector(union, state=state, timeout=timeout)
+    except PlaywrightTimeoutError:
+        return None, None
+
+    # The page now has at least one candidate; prefer list order over document order
+    for selector in selectors:
+        try:
+            candidate = await page.query_selector(selector)
+            if not candidate or (state == "visible" and not await candidate.is_visible()):
+                continue
+        except PlaywrightError:
+            continue
+        if cache_key is not None:
+            remember_selector(*cache_key, selector)
+        return selector, candidate
+
+    return union, element
+
+def capture_images(page, url_patterns):
+    """Collect image responses whose URL contains any of url_patterns.
+
+    Returns a dict of url -> body bytes that fills in as the page loads, so
+    result images can be saved without fetching them a second time.
+    """
+    captured = {}
+
+    async def _on_response(response):
+        if not any(pattern in response.url for pattern in url_patterns):
+            return
+        if not response.headers.get("content-type", "").startswith("image/"):
+            return
+        try:
+            captured[response.url] = await response.body()
+        except Exception:
+            # Bodies of redirected or evicted responses are not available
+            pass
+
+    page.on("response", _on_response)
+    return captured
+
+async def debug_screenshot(page, name):
+    """Save a JPEG screenshot to ./debug/<name>.jpg when PW_DEBUG_SHOTS is set; never raises"""
+    if not DEBUG_SHOTS:
+        return
+    try:
+        DEBUG_DIR.mkdir(parents=True, exist_ok=True)
+        await page.screenshot(path=str(DEBUG_DIR / f"{name}.jpg"), full_page=False, type='jpeg', quality=60)
+    except Exception:
+        pass
+
+async def block_resources(page, resource_types=BLOCKED_RESOURCE_TYPES, hosts=TRACKER_HOSTS):
+    """Abort requests of the given resource types or to tracker hosts on a page.
+
+    Returns the route handler so it can be removed with page.unroute("**/*", handler)
+    once the blocked resources are needed again.
+    """
+    async def _handler(route):
+        request = route.request
+        if request.resource_type in resource_types or any(host in request.url for host in hosts):
+            await route.abort()
+        else:
+            # Hand off to context routes (e.g. HAR replay) instead of going straight to the network
+            await route.fallback()
+
+    await page.route("**/*", _handler)
+    return _handler
+
+async def first_success(coroutines):
+    """Run coroutines concurrently and return the first non-None result, cancelling the rest.
+
+    Raced coroutines must only produce a result: leave side effects such as
+    file writes to the caller, since cancelling a task does not stop work it
+    handed to a thread. The cancelled tasks are awaited so their page cleanup
+    has run before the caller closes the context.
+    """
+    pending = {asyncio.ensure_future(coroutine) for coroutine in coroutines}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result() is not None:
+                    return task.result()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+async def goto_commit(page, url, timeout=NAV_COMMIT_TIMEOUT, raise_on_timeout=False):
+    """Navigate until the response starts arriving and return it.
+
+    By default a slow commit is not an error: None is returned and the
+    caller's element waits decide whether the page became usable. Pass
+    raise_on_timeout=True under retry_async, which only retries what raises.
+    """
+    try:
+        return await page.goto(url, timeout=timeout, wait_until='commit')
+    except PlaywrightTimeoutError:
+        if raise_on_timeout:
+            raise
+        return None
+
+# True once the last match's text is non-empty and the same length as on the previous poll
+_TEXT_STABLE_JS = """sel => {
+    const els = document.querySelectorAll(sel);
+    if (!els.length) return false;
+    const len = els[els.length - 1].innerText.length;
+    const stable = len > 0 && window.__lastTextLen === len;
+    window.__lastTextLen = len;
+    return stable;
+}"""
+
+# Rendered, trimmed text of an element with its length, so a size check needs no second round-trip
+TRIMMED_TEXT_JS = "el => { const text = el.innerText.trim(); return [text.length, text]; }"
+
+# True once a selector matches more elements than a count taken before submitting
+_COUNT_ABOVE_JS = "([sel, n]) => document.querySelectorAll(sel).length > n"
+
+async def wait_for_stable_text(page, selector, appear_timeout=60000, settle_timeout=60000, polling=1000, previous=0):
+    """Wait for selector to match more than previous elements, then for its last match to stop changing length.
+
+    Pass the match count from before submitting as previous so replies already
+    on the page do not satisfy the wait. Returns False if either wait times
+    out, so callers can still capture whatever was rendered.
+    """
+    try:
+        await page.wait_for_function(_COUNT_ABOVE_JS, arg=[selector, previous], polling=250, timeout=appear_timeout)
+        await page.wait_for_function(_TEXT_STABLE_JS, arg=selector, polling=polling, timeout=settle_timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+@dataclass
+class SelectorBudget:
+    """A wait budget shared by consecutive selector waits, so misses cannot stack past total_ms"""
+    total_ms: int = SELECTOR_BUDGET_MS
+    start: float = field(default_factory=time.monotonic)
+
+    def remaining(self, cap=None):
+        """Milliseconds left (at least 1, since 0 disables Playwright timeouts), optionally capped"""
+        left = self.total_ms - int((time.monotonic() - self.start) * 1000)
+        if cap is not None:
+            left = min(left, cap)
+        return max(1, left)
+
+def prewarm(context, url):
+    """Start a throwaway request on the context so later context.request downloads from the same host reuse a warm connection"""
+    async def _warm():
+        try:
+            response = await context.request.get(url, timeout=10000)
+            await response.dispose()
+        except Exception:
+            pass
+
+    return asyncio.create_task(_warm())
+
+def _is_transient(error):
+    """Return True for errors a later attempt may not hit: timeouts, dropped connections and 5xx"""
+    if isinstance(error, (PlaywrightTimeoutError, ConnectionError)):
+        return True
+    return isinstance(error, PlaywrightError) and bool(_SERVER_ERROR_RE.search(error.message))
+
+async def retry_async(fn, max_attempts=3, base=1.0, cap=30.0, jitter=0.5):
+    """Await fn() until it succeeds, sleeping with exponential backoff and jitter between transient failures.
+
+    A result with a 5xx status (e.g. the Response from page.goto) is retried like an error;
+    the last attempt's result or error is passed through unchanged.
+    """
+    for attempt in range(max_attempts):
+        last = attempt == max_attempts - 1
+        try:
+            result = await fn()
+        except Exception as e:
+            if last or not _is_transient(e):
+                raise
+            reason = e
+        else:
+            status = getattr(result, "status", None)
+            if last or not isinstance(status, int) or status < 500:
+                return result
+            reason = f"HTTP {status}"
+
+        delay = min(cap, base * 2 ** attempt) * (1 + random.uniform(-jitter, jitter))
+        logger.warning("Attempt %s/%s failed (%s), retrying in %.1fs", attempt + 1, max_attempts, reason, delay)
+        await asyncio.sleep(delay)
+
+# JPEG start-of-frame markers carry the image size; C4, C8 and CC are other segments
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def _jpeg_size(data):
+    """Walk the JPEG segments up to the first start-of-frame and return its (width, height)"""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+        elif marker in _JPEG_SOF_MARKERS:
+            return int.from_bytes(data[i + 7:i + 9], 'big'), int.from_bytes(data[i + 5:i + 7], 'big')
+        elif marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+        else:
+            i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+def image_size(data):
+    """Return (width, height) read from a JPEG, PNG, GIF or WebP header, or None for anything else"""
+    if data[:3] == b'\xff\xd8\xff':
+        return _jpeg_size(data)
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return int.from_bytes(data[6:8], 'little'), int.from_bytes(data[8:10], 'little')
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            return int.from_bytes(data[26:28], 'little') & 0x3FFF, int.from_bytes(data[28:30], 'little') & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+    return None
+
+def is_image_bytes(data, min_pixels=64 * 64):
+    """Whether data is a raster image of at least min_pixels, judged from its header without decoding"""
+    size = image_size(data)
+    return size is not None and size[0] * size[1] >= min_pixels
+
+# Flags for writing output files straight through os.write
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+
+def _write_bytes(path, data):
+    """Write data with raw os.write calls, skipping Python's buffered file layer"""
+    fd = os.open(path, _WRITE_FLAGS, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+async def save_bytes(path, data):
+    """Write bytes to a file in a worker thread so the event loop keeps serving the browser"""
+    await asyncio.to_thread(_write_bytes, path, data)
+
+async def save_text(path, text):
+    """Write text to a UTF-8 file in a worker thread"""
+    await asyncio.to_thread(_write_bytes, path, text.encode('utf-8'))
+
+class BrowserSession:
+    """An open page on a site plus the selectors resolved on it, reused across prompts"""
+
+    __slots__ = ("site", "page", "input_selector", "submit_selector", "extras")
+
+    def __init__(self, site, page, input_selector, **extras):
+        self.site = site
+        self.page = page
+        self.input_selector = input_selector
+        self.submit_selector = None
+        # Site-specific state such as captured image bodies
+        self.extras = extras
+
+    @property
+    def input(self):
+        """Locator for the prompt input, re-resolved so it survives navigations"""
+        return self.page.locator(self.input_selector).first
+
+    async def enter_prompt(self, prompt, timeout=5000):
+        """Fill the prompt input and wait until it holds the prompt instead of sleeping"""
+        input_field = self.input
+        await input_field.click()
+        await input_field.fill(prompt)
+        if await input_field.evaluate("el => el.isContentEditable"):
+            await expect(input_field).to_have_text(prompt, timeout=timeout)
+        else:
+            await expect(input_field).to_have_value(prompt, timeout=timeout)
+
+    async def find_submit(self, selectors, step, timeout=5000):
+        """Return a locator for the submit button, probing the candidates only once per session"""
+        if self.submit_selector is None:
+            selector, _ = await find_first(self.page, selectors, timeout=timeout, cache_key=(self.site, step))
+            if selector is None:
+                return None
+            self.submit_selector = selector
+        return self.page.locator(self.submit_selector).first
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Shared Playwright Browser Pool
+Keeps one Chromium process per event loop so automations only pay for:
+1. A single Playwright start and browser launch
+2. A cheap, isolated BrowserContext per run
+3. One shutdown when the caller is done
+
+BrowserPool caps how many of those contexts are open at the same time.
+
+Each site's cookies and local storage are saved between runs so later
+contexts start from a warm session instead of a cold page load. Standalone
+runs can instead keep a whole Chromium profile per site (HTTP cache, HSTS,
+service workers) with new_persistent_context().
+
+Set PLAYWRIGHT_HAR=record to save each site's network traffic to
+./har/{site}.har, and PLAYWRIGHT_HAR=replay to serve later runs from that
+file (requests it does not cover still go to the network).
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import socket
+from contextlib import asynccontextmanager
+from pathlib import Path
+from playwright.async_api import async_playwright
+
+logger = logging.getLogger(__name__)
+
+# Chromium subsystems none of the automations use; each starts its own threads and memory
+DISABLED_FEATURES = (
+    'Translate',
+    'BackgroundNetworking',
+    'MediaRouter',
+    'OptimizationHints',
+    'InterestFeedContentSuggestions',
+    'PrivacySandboxSettings4',
+    # One renderer per site is not needed for a single scripted tab
+    'IsolateOrigins',
+    'site-per-process'
+)
+
+# Launch settings shared by every automation using the pool. GPU raster stays
+# enabled so canvas/WebGL result previews are not forced onto the software path.
+LAUNCH_ARGS = [
+    '--headless=new',
+    '--no-sandbox',
+    '--disable-blink-features=AutomationControlled',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-default-apps',
+    # Background services that keep running after the page is ready
+    '--disable-background-networking',
+    '--disable-sync',
+    '--disable-features=' + ','.join(DISABLED_FEATURES),
+    '--disable-breakpad',
+    '--disable-crash-reporter',
+    '--disable-hang-monitor',
+    '--metrics-recording-only',
+    '--mute-audio',
+    # Headless tabs count as hidden; keep their timers and rendering at full speed
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-ipc-flooding-protection'
+]
+# Containers often mount a 64MB /dev/shm, too small for Chromium's shared memory
+SMALL_SHM_BYTES = 512 * 1024 * 1024
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+VIEWPORT = {'width': 1920, 'height': 1080}
+STATE_DIR = Path("./data")
+PROFILE_DIR = Path("./.browser-profile")
+HAR_DIR = Path("./har")
+HAR_MODE = os.environ.get("PLAYWRIGHT_HAR", "").lower()
+
+_playwright = None
+_browser = None
+_launch_lock = asyncio.Lock()
+_profile_ids = itertools.count(1)
+_har_recording = set()
+
+def _launch_args():
+    """Return LAUNCH_ARGS, falling back to /tmp for shared memory when /dev/shm is small"""
+    args = list(LAUNCH_ARGS)
+    try:
+        if shutil.disk_usage('/dev/shm').total < SMALL_SHM_BYTES:
+            args.append('--disable-dev-shm-usage')
+    except OSError:
+        args.append('--disable-dev-shm-usage')
+    return args
+
+async def _start_playwright():
+    """Start the Playwright driver once; callers must hold _launch_lock"""
+    global _playwright
+
+    if _playwright is None:
+        _playwright = await async_playwright().start()
+    return _playwright
+
+async def get_browser():
+    """Return the shared browser, launching it on first use"""
+    global _browser
+
+    async with _launch_lock:
+        if _browser is None or not _browser.is_connected():
+            await _start_playwright()
+            logger.info("Launching shared Chromium browser")
+            # run_with_browser closes the browser on Ctrl-C, so Playwright's own SIGINT handler is not needed
+            _browser = await _playwright.chromium.launch(
+                headless=True, args=_launch_args(), chromium_sandbox=False, handle_sigint=False
+            )
+    return _browser
+
+def har_path(site):
+    """Return where the recorded network traffic for a site is kept"""
+    return HAR_DIR / f"{site}.har"
+
+def _har_options(site, options, record_har=True):
+    """Add HAR recording to context options when PLAYWRIGHT_HAR=record.
+
+    Returns True when this context records. Only one context per site records
+    at a time, and raced contexts (record_har=False) never do, since the
+    last one to close would overwrite the file with a losing page's traffic.
+    """
+    if HAR_MODE != "record" or site is None or not record_har:
+        return False
+    if site in _har_recording:
+        logger.info("Another %s context is recording its HAR, not recording this one", site)
+        return False
+    HAR_DIR.mkdir(parents=True, exist_ok=True)
+    options['record_har_path'] = str(har_path(site))
+    options.setdefault('record_har_mode', 'minimal')
+    _har_recording.add(site)
+    return True
+
+def _track_har(context, site):
+    """Let another context for the site record once this recording context closes"""
+    context.on("close", lambda _: _har_recording.discard(site))
+
+async def _replay_har(context, site):
+    """Serve a context from the site's HAR when PLAYWRIGHT_HAR=replay and one was recorded"""
+    if HAR_MODE == "replay" and site is not None:
+        path = har_path(site)
+        if path.exists():
+            logger.info("Replaying network traffic from %s", path)
+            await context.route_from_har(str(path), not_found="fallback")
+        else:
+            logger.warning("No HAR recorded for %s, using the live site", site)
+
+def state_path(site):
+    """Return where the storage state for a site is kept"""
+    return STATE_DIR / f"pw_state_{site}.json"
+
+async def new_context(site=None, record_har=True, **options):
+    """Open a fresh context on the shared browser with the default user agent and viewport.
+
+    When a site is given and a storage state was saved for it, the context
+    starts with that site's cookies and local storage. Pass record_har=False
+    for contexts raced against each other.
+    """
+    if site is not None and 'storage_state' not in options:
+        path = state_path(site)
+        if path.exists():
+            options['storage_state'] = str(path)
+    options.setdefault('user_agent', USER_AGENT)
+    options.setdefault('viewport', VIEWPORT)
+    recording = _har_options(site, options, record_har)
+    browser = await get_browser()
+    try:
+        context = await browser.new_context(**options)
+    except BaseException:
+        if recording:
+            _har_recording.discard(site)
+        raise
+    if recording:
+        _track_har(context, site)
+    await _replay_har(context, site)
+    return context
+
+def _pid_alive(pid):
+    """Whether a process with this pid is running on this machine"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _profile_locked(path):
+    """Whether a live browser holds the profile's SingletonLock.
+
+    Chromium points the lock at "<hostname>-<pid>" and takes over locks left
+    by dead processes on the same host, so only a running holder counts.
+    """
+    lock = path / "SingletonLock"
+    if not os.path.lexists(lock):
+        return False
+    try:
+        host, _, pid = os.readlink(lock).rpartition("-")
+    except OSError:
+        return True
+    # Another machine's lock cannot be checked from here
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    return _pid_alive(int(pid))
+
+def _remove_stale_profiles(site):
+    """Delete private profiles left behind by processes that are no longer running"""
+    for path in PROFILE_DIR.glob(f"{site}-*-*"):
+        pid = path.name[len(site) + 1:].split("-")[0]
+        if pid.isdigit() and not _pid_alive(int(pid)):
+            shutil.rmtree(path, ignore_errors=True)
+
+def profile_path(site):
+    """Return the site's Chromium profile, or a private one when a running browser holds its lock"""
+    _remove_stale_profiles(site)
+    path = PROFILE_DIR / site
+    # Chromium allows one writer per profile; concurrent runs get their own directory
+    if _profile_locked(path):
+        path = PROFILE_DIR / f"{site}-{os.getpid()}-{next(_profile_ids)}"
+    return path
+
+async def new_persistent_context(site, **options):
+    """Launch a browser on the site's on-disk profile and return its context.
+
+    The profile keeps the disk cache and cookies across runs, so warm starts
+    skip most of the first page load. Unlike new_context() this starts a
+    separate browser process, which closes with the context.
+    """
+    options.setdefault('user_agent', USER_AGENT)
+    options.setdefault('viewport', VIEWPORT)
+    path = profile_path(site)
+    path.mkdir(parents=True, exist_ok=True)
+    async with _launch_lock:
+        playwright = await _start_playwright()
+    recording = _har_options(site, options)
+    logger.info("Launching Chromium with profile %s", path)
+    try:
+        context = await playwright.chromium.launch_persistent_context(
+            str(path), headless=True, args=_launch_args(), chromium_sandbox=False, handle_sigint=False, **options
+        )
+    except BaseException:
+        if recording:
+            _har_recording.discard(site)
+        raise
+    if recording:
+        _track_har(context, site)
+    await _replay_har(context, site)
+    if path.name != site:
+        # Private profiles only stood in for a busy one; nothing later reuses them
+        context.on("close", lambda _: shutil.rmtree(path, ignore_errors=True))
+    return context
+
+async def save_state(context, site):
+    """Save a context's cookies and local storage for the next run against a site"""
+    path = state_path(site)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    await context.storage_state(path=str(path))
+
+async def new_request_context(**options):
+    """Open an API request context on the shared driver without launching a browser"""
+    options.setdefault('user_agent', USER_AGENT)
+    async with _launch_lock:
+        playwright = await _start_playwright()
+    return await playwright.request.new_context(**options)
+
+class BrowserPool:
+    """Hands out contexts on the shared browser, keeping at most max_concurrent open at once"""
+
+    def __init__(self, max_concurrent=None):
+        self._semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+
+    async def acquire(self, site=None, **options):
+        """Wait for a free slot, then open a context as new_context() does"""
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        try:
+            return await new_context(site=site, **options)
+        except BaseException:
+            if self._semaphore is not None:
+                self._semaphore.release()
+            raise
+
+    async def release(self, context):
+        """Close a context from acquire() and free its slot"""
+        try:
+            await context.close()
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    @asynccontextmanager
+    async def context(self, site=None, **options):
+        """Acquire a context for the duration of an async with block"""
+        context = await self.acquire(site, **options)
+        try:
+            yield context
+        finally:
+            await self.release(context)
+
+async def close_browser():
+    """Close the shared browser and stop Playwright"""
+    global _playwright, _browser
+
+    async with _launch_lock:
+        if _browser is not None:
+            await _browser.close()
+            _browser = None
+        if _playwright is not None:
+            await _playwright.stop()
+            _playwright = None
+
+async def run_with_browser(automation, **kwargs):
+    """Run one automation as a standalone script and shut the shared browser down afterwards"""
+    try:
+        return await automation(**kwargs)
+    finally:
+        await close_browser()
@@ -5,181 +5,272 @@ Automates browser interactions with Claude to:
 1. Navigate to https://claude.ai
 2. Submit a text prompt
 3. Capture and save the AI response
+
+When a signed-in session has been saved, the prompt is sent straight to
+Claude's JSON/SSE endpoints and the browser is only used as a fallback.
 """
 
 import asyncio
+import json
 import os
 import time
+import uuid
 import logging
+from contextlib import AsyncExitStack
 from pathlib import Path
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, expect
+
+from .automation_utils import BrowserSession, block_resources, debug_screenshot, find_first, save_text
+from .browser_pool import new_context, new_request_context, run_with_browser, save_state, state_path
+from .log_setup import setup_logging, stop_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTDIR = Path("./data/output")
+OUTPUT_NAME = "claude-text-completion.txt"
+DEFAULT_PROMPT = "What are the key principles of good software engineering?"
+
+def _parse_completion_stream(body):
+    """Join the text chunks of a completion SSE body"""
+    parts = []
+    for line in body.splitlines():
+        if not line.startswith("data:"):
+            continue
+        try:
+            event = json.loads(line[5:])
+        except ValueError:
+            continue
+        if not isinstance(event, dict):
+            continue
+        if "completion" in event:
+            parts.append(event["completion"])
+        elif event.get("type") == "content_block_delta":
+            parts.append(event.get("delta", {}).get("text", ""))
+    return "".join(parts)
+
+async def claude_chat_completion_api(prompt, session_file=None):
+    """Send a prompt to Claude's completion endpoint using saved browser cookies.
+
+    Returns the response text, or None when no session is saved or the
+    endpoints no longer behave as expected, so callers can fall back to the browser.
+    """
+    session_file = Path(session_file or state_path("claude"))
+    if not session_file.exists():
+        return None
+    
+    request = await new_request_context(base_url="https://claude.ai", storage_state=str(session_file))
+    try:
+        response = await request.get("/api/organizations")
+        if not response.ok:
+            logger.info("Claude API fast path unavailable: HTTP %s", response.status)
+            return None
+        org_id = (await response.json())[0]["uuid"]
+        
+        conversation_id = str(uuid.uuid4())
+        conversations_url = f"/api/organizations/{org_id}/chat_conversations"
+        response = await request.post(conversations_url, data={"uuid": conversation_id, "name": ""})
+        if not response.ok:
+            logger.info("Claude API fast path could not create a conversation: HTTP %s", response.status)
+            return None
+        
+        response = await request.post(
+            f"{conversations_url}/{conversation_id}/completion",
+            data={"prompt": prompt, "timezone": "UTC", "attachments": [], "files": []},
+            headers={"Accept": "text/event-stream"},
+            timeout=120000
+        )
+        if not response.ok:
+            logger.info("Claude API fast path completion failed: HTTP %s", response.status)
+            return None
+        
+        text = _parse_completion_stream(await response.text())
+        return text.strip() or None
+    except Exception as e:
+        logger.warning("Claude API fast path failed, falling back to the browser: %s", e)
+        return None
+    finally:
+        await request.dispose()
 
-async def claude_chat_automation(output_dir=None, prompt=None):
+async def _save_response(output_file, prompt, text_content):
+    """Write the prompt and Claude's response to the output file"""
+    await save_text(output_file, (
+        f"Prompt: {prompt}\n\n"
+        f"Response from Anthropic Claude:\n"
+        f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        f"{text_content.strip()}"
+    ))
+
+async def open_session(page):
+    """Open Claude on a page and resolve its chat input.
+
+    Returns a BrowserSession, or None when the input cannot be found.
+    """
+    # Only text is read back, so skip images, fonts and trackers for the whole run
+    await block_resources(page)
+    
+    logger.info("Navigating to Claude AI")
+    await page.goto("https://claude.ai/", timeout=60000)
+    
+    # Look for chat interface
+    logger.info("Looking for chat input")
+    input_selectors = [
+        'div[contenteditable="true"]',
+        'textarea[placeholder*="Talk"]',
+        'textarea[placeholder*="Message"]',
+        'textarea',
+        'input[type="text"]'
+    ]
+    
+    selector, input_field = await find_first(page, input_selectors, timeout=10000, cache_key=("claude", "input"))
+    if not input_field:
+        logger.error("Could not find input field")
+        await debug_screenshot(page, "claude_no_input")
+        return None
+    
+    logger.debug("Found input field: %s", selector)
+    return BrowserSession("claude", page, selector)
+
+async def submit(session, prompt, output_dir):
+    """Send a prompt in an open session and save Claude's reply to output_dir"""
+    page = session.page
+    output_file = Path(output_dir) / OUTPUT_NAME
+    
+    # Enter the prompt
+    logger.info("Entering prompt: %s", prompt)
+    
+    await session.enter_prompt(prompt)
+    
+    # Look for send button
+    send_selectors = [
+        'button[aria-label*="Send"]',
+        'button:has-text("Send")',
+        'button[type="submit"]',
+        'svg[data-icon="send"]',
+        '[data-testid="send-button"]'
+    ]
+    
+    send_button = await session.find_submit(send_selectors, "send")
+    if send_button is None:
+        logger.error("No send button found")
+        await debug_screenshot(page, "claude_no_send")
+        return False
+    
+    # Look for response elements
+    response_selectors = [
+        '[data-testid*="message"]',
+        '.message-content',
+        '[role="assistant"]',
+        '.prose',
+        '.claude-response'
+    ]
+    response_selector = ", ".join(response_selectors)
+    # On a reused page earlier replies stay attached; only elements after them belong to this prompt
+    previous = await page.locator(response_selector).count()
+    
+    logger.debug("Found send button: %s", session.submit_selector)
+    logger.info("Clicking send button")
+    await expect(send_button).to_be_enabled(timeout=5000)
+    await send_button.click()
+    
+    # The stop button mounts once the reply starts streaming and unmounts when it is done;
+    # the message selectors are no signal here since the prompt itself matches them
+    logger.info("Waiting for Claude response")
+    stop_button = 'button[aria-label="Stop response"]'
+    try:
+        await page.wait_for_selector(stop_button, state="attached", timeout=60000)
+        await page.wait_for_selector(stop_button, state="detached", timeout=120000)
+    except PlaywrightTimeoutError:
+        logger.warning("Claude response not complete, capturing what is available")
+    
+    # One query for every candidate; document order puts the latest reply last
+    response_elements = (await page.query_selector_all(response_selector))[previous:]
+    if response_elements:
+        logger.debug("Found %s new response elements", len(response_elements))
+    
+    # Get the last response
+    for element in response_elements[-2:]:
+        try:
+            text_content = await element.text_content()
+            # Skip the echoed prompt, which is also long enough to pass the length check
+            if text_content and len(text_content.strip()) > 50 and text_content.strip() != prompt.strip():
+                logger.info("Captured Claude response (%s chars)", len(text_content))
+                
+                # Save response to file
+                await _save_response(output_file, prompt, text_content)
+                logger.info("Saved response to: %s", output_file)
+                
+                # Keep the session for the next run and the API fast path
+                await save_state(page.context, "claude")
+                return True
+        except Exception as e:
+            logger.error("Error extracting text: %s", e)
+            continue
+    
+    logger.warning("No response found")
+    await debug_screenshot(page, "claude_no_response")
+    return False
+
+async def claude_chat_fast_path(output_dir=None, prompt=None):
+    """Answer through the API with a saved session, without opening a browser; False means the browser run is needed"""
+    output_dir = Path(output_dir or DEFAULT_OUTDIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if prompt is None:
+        prompt = DEFAULT_PROMPT
+    
+    text_content = await claude_chat_completion_api(prompt)
+    if not text_content:
+        return False
+    
+    output_file = output_dir / OUTPUT_NAME
+    logger.info("Captured Claude response via API (%s chars)", len(text_content))
+    await _save_response(output_file, prompt, text_content)
+    logger.info("Saved response to: %s", output_file)
+    return True
+
+async def claude_chat_automation(output_dir=None, prompt=None, context=None):
     """Main automation function for Anthropic Claude"""
     
     # Set up paths with defaults
-    if output_dir is None:
-        output_dir = Path("./data/output")
-    else:
-        output_dir = Path(output_dir)
+    output_dir = Path(output_dir or DEFAULT_OUTDIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
     
     if prompt is None:
-        prompt = "What are the key principles of good software engineering?"
-    
-    output_file = output_dir / "claude-text-completion.txt"
-    
-    async with async_playwright() as p:
-        # Launch browser with stealth settings
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--no-first-run',
-                '--no-default-browser-check'
-            ]
-        )
-        
-        context = await browser.new_context(
-            user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            viewport={'width': 1920, 'height': 1080}
-        )
+        prompt = DEFAULT_PROMPT
+    
+    # Skip the browser entirely when a saved session can reach the API; callers passing
+    # a context (main.py, run_all) have already tried this before opening it
+    if context is None and await claude_chat_fast_path(output_dir, prompt):
+        return True
+    
+    async with AsyncExitStack() as stack:
+        if context is None:
+            # Open a private context on the shared browser
+            context = await new_context(site="claude")
+            stack.push_async_callback(context.close)
         
         page = await context.new_page()
         
         try:
-            logging.info("Navigating to Claude AI")
-            await page.goto("https://claude.ai/", timeout=60000)
-            
-            # Wait for page to load
-            await asyncio.sleep(5)
-            
-            # Look for chat interface
-            logging.info("Looking for chat input")
-            input_selectors = [
-                'div[contenteditable="true"]',
-                'textarea[placeholder*="Talk"]',
-                'textarea[placeholder*="Message"]',
-                'textarea',
-                'input[type="text"]'
-            ]
-            
-            input_field = None
-            for selector in input_selectors:
-                try:
-                    input_field = await page.wait_for_selector(selector, timeout=10000)
-                    if input_field:
-                        logging.info(f"Found input field: {selector}")
-                        break
-                except:
-                    continue
-            
-            if input_field:
-                # Enter the prompt
-                logging.info(f"Entering prompt: {prompt}")
-                
-                await input_field.click()
-                await asyncio.sleep(1)
-                await input_field.fill(prompt)
-                await asyncio.sleep(2)
-                
-                # Look for send button
-                send_selectors = [
-                    'button[aria-label*="Send"]',
-                    'button:has-text("Send")',
-                    'button[type="submit"]',
-                    'svg[data-icon="send"]',
-                    '[data-testid="send-button"]'
-                ]
-                
-                send_button = None
-                for selector in send_selectors:
-                    try:
-                        send_button = await page.wait_for_selector(selector, timeout=5000)
-                        if send_button:
-                            logging.info(f"Found send button: {selector}")
-                            break
-                    except:
-                        continue
-                
-                if send_button:
-                    logging.info("Clicking send button")
-                    await send_button.click()
-                    
-                    # Wait for response
-                    logging.info("Waiting for Claude response")
-                    await asyncio.sleep(12)  # Claude can take time to respond
-                    
-                    # Look for response elements
-                    response_selectors = [
-                        '[data-testid*="message"]',
-                        '.message-content',
-                        '[role="assistant"]',
-                        '.prose',
-                        '.claude-response'
-                    ]
-                    
-                    for selector in response_selectors:
-                        try:
-                            await asyncio.sleep(3)  # Wait for response completion
-                            
-                            response_elements = await page.query_selector_all(selector)
-                            if response_elements:
-                                logging.info(f"Found {len(response_elements)} response elements")
-                                
-                                # Get the last response
-                                for element in response_elements[-2:]:
-                                    try:
-                                        text_content = await element.text_content()
-                                        if text_content and len(text_content.strip()) > 50:
-                                            logging.info(f"Captured Claude response ({len(text_content)} chars)")
-                                            
-                                            # Save response to file
-                                            with open(output_file, 'w', encoding='utf-8') as f:
-                                                f.write(f"Prompt: {prompt}\n\n")
-                                                f.write(f"Response from Anthropic Claude:\n")
-                                                f.write(f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                                                f.write(text_content.strip())
-                                            
-                                            logging.info(f"Saved response to: {output_file}")
-                                            return True
-                                    except Exception as e:
-                                        logging.error(f"Error extracting text: {e}")
-                                        continue
-                                break
-                        except Exception as e:
-                            logging.error(f"Error with selector {selector}: {e}")
-                            continue
-                    
-                    logging.warning("No response found")
-                    await page.screenshot(path="./debug/claude_no_response.png")
-                else:
-                    logging.error("No send button found")
-                    await page.screenshot(path="./debug/claude_no_send.png")
-            else:
-                logging.error("Could not find input field")
-                await page.screenshot(path="./debug/claude_no_input.png")
+            session = await open_session(page)
+            if session is None:
+                return False
+            return await submit(session, prompt, output_dir)
                 
         except Exception as e:
-            logging.error(f"Error during automation: {e}")
-            await page.screenshot(path="./debug/claude_error.png")
+            logger.error("Error during automation: %s", e)
+            await debug_screenshot(page, "claude_error")
             return False
         
         finally:
-            await browser.close()
-    
-    return False
+            await page.close()
 
 if __name__ == "__main__":
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    success = asyncio.run(claude_chat_automation())
-    if success:
-        logging.info("Claude automation completed successfully")
-    else:
-        logging.error("Claude automation failed")
\ No newline at end of file
+    listener = setup_logging()
+    try:
+        success = asyncio.run(run_with_browser(claude_chat_automation))
+        if success:
+            logger.info("Claude automation completed successfully")
+        else:
+            logger.error("Claude automation failed")
+    finally:
+        stop_logging(listener)
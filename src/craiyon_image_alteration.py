@@ -11,201 +11,223 @@ import asyncio
 import os
 import time
 import logging
+from contextlib import AsyncExitStack
 from pathlib import Path
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, expect
 
-async def craiyon_image_automation(output_dir=None, prompt=None):
+from .automation_utils import BrowserSession, block_resources, debug_screenshot, capture_images, find_first, first_success, is_image_bytes, prewarm, save_bytes
+from .browser_pool import new_context, run_with_browser, save_state
+from .log_setup import setup_logging, stop_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTDIR = Path("./data/output")
+OUTPUT_NAME_TEMPLATE = "craiyon-altered-{}.jpg"
+
+async def open_session(page):
+    """Open Craiyon on a page and resolve its prompt input.
+
+    Returns a BrowserSession, or None when the input cannot be found.
+    """
+    # Keep result image bodies as the browser downloads them
+    captured_images = capture_images(page, ['craiyon'])
+    # Skip heavy assets until the first prompt is submitted; result images must load afterwards
+    block_handler = await block_resources(page)
+    
+    logger.info("Navigating to Craiyon")
+    await page.goto("https://www.craiyon.com/", timeout=60000)
+    
+    # Look for the prompt input
+    logger.info("Looking for prompt input")
+    input_selectors = [
+        'input[placeholder*="Enter a prompt"]',
+        'textarea[placeholder*="prompt"]',
+        'input[type="text"]',
+        'textarea',
+        '#prompt-input',
+        '.prompt-input'
+    ]
+    
+    selector, input_field = await find_first(page, input_selectors, timeout=10000, cache_key=("craiyon", "input"))
+    if not input_field:
+        logger.error("Could not find input field")
+        await debug_screenshot(page, "craiyon_no_input")
+        return None
+    
+    logger.debug("Found input field: %s", selector)
+    return BrowserSession("craiyon", page, selector, captured_images=captured_images, block_handler=block_handler)
+
+async def _fetch_image(context, captured_images, i, img):
+    """Return (i, bytes) for a usable result image, or None"""
+    try:
+        img_src = await img.get_attribute('src')
+        if not img_src or img_src.startswith('data:'):
+            logger.warning("Skipping image %s: data URL or empty src", i+1)
+            return None
+        logger.debug("Attempting to download image %s: %s", i+1, img_src)
+        
+        # Handle relative URLs
+        if img_src.startswith('/'):
+            img_src = f"https://www.craiyon.com{img_src}"
+        elif not img_src.startswith('http'):
+            img_src = f"https://www.craiyon.com/{img_src}"
+        
+        # Reuse the bytes the browser already fetched, download only as a fallback
+        image_data = captured_images.get(img_src)
+        if image_data is None:
+            response = await context.request.get(img_src)
+            if response.status != 200:
+                logger.error("Failed to download image %s: HTTP %s", i+1, response.status)
+                return None
+            image_data = await response.body()
+        if is_image_bytes(image_data):  # Skip placeholders, icons and SVG logos
+            return i, image_data
+    except Exception as e:
+        logger.error("Error downloading image %s: %s", i+1, e)
+    return None
+
+async def submit(session, prompt, output_dir):
+    """Generate images for a prompt in an open session and save the first result to output_dir"""
+    page = session.page
+    context = page.context
+    output_dir = Path(output_dir)
+    
+    # Enter the prompt
+    logger.info("Entering prompt: %s", prompt)
+    
+    await session.enter_prompt(prompt)
+    
+    # Look for generate button
+    generate_selectors = [
+        'button:has-text("DRAW")',
+        'button:has-text("Generate")',
+        'button:has-text("Create")',
+        'button[type="submit"]',
+        'input[type="submit"]',
+        '.generate-btn'
+    ]
+    
+    generate_button = await session.find_submit(generate_selectors, "generate")
+    if generate_button is None:
+        logger.error("No generate button found")
+        await debug_screenshot(page, "craiyon_no_button")
+        return False
+    
+    logger.debug("Found generate button: %s", session.submit_selector)
+    
+    block_handler = session.extras.pop("block_handler", None)
+    if block_handler is not None:
+        # Let result images through but keep trackers blocked
+        await page.unroute("**/*", block_handler)
+        await block_resources(page, resource_types=())
+    
+    # A reused page still shows the previous grid; only images with new sources belong to this prompt
+    previous_srcs = await page.eval_on_selector_all('.generated-image img', "imgs => imgs.map(img => img.src)")
+    
+    logger.info("Clicking generate button")
+    await expect(generate_button).to_be_enabled(timeout=5000)
+    await generate_button.click()
+    # Open the CDN connection during generation so a fallback download skips the handshake
+    cdn_warmup = prewarm(context, "https://img.craiyon.com/favicon.ico")
+    
+    # Wait until the full grid of results is on the page instead of a fixed delay
+    logger.info("Waiting for image generation")
+    try:
+        await page.wait_for_function(
+            "old => Array.from(document.querySelectorAll('.generated-image img')).filter(img => !old.includes(img.src)).length >= 9",
+            arg=previous_srcs,
+            timeout=90000
+        )
+    except PlaywrightTimeoutError:
+        logger.warning("Timed out waiting for the generated image grid")
+    await cdn_warmup
+    
+    # Look for generated images
+    image_selectors = [
+        'img[src*="craiyon"]',
+        'img[src*="generated"]',
+        'img[alt*="Generated"]',
+        '.generated-image img',
+        '.result img',
+        'img[data-testid*="result"]'
+    ]
+    
+    # One query for every candidate; the src checks below filter the matches
+    image_selector = ", ".join(image_selectors)
+    generated_images = await page.query_selector_all(image_selector)
+    if previous_srcs:
+        # Read each handle's own src so an image added meanwhile cannot be paired with another's
+        generated_images = [img for img in generated_images if await img.evaluate("img => img.src") not in previous_srcs]
+    if not generated_images:
+        logger.warning("No generated images found")
+        await debug_screenshot(page, "craiyon_no_result")
+        return False
+    
+    logger.debug("Found %s candidate images", len(generated_images))
+    captured_images = session.extras["captured_images"]
+    
+    # Race the first three candidates and keep whichever yields usable bytes first
+    result = await first_success(
+        _fetch_image(context, captured_images, i, img) for i, img in enumerate(generated_images[:3])
+    )
+    if result is None:
+        logger.error("Could not download any generated images")
+        return False
+    
+    i, image_data = result
+    output_path = output_dir / OUTPUT_NAME_TEMPLATE.format(i + 1)
+    await save_bytes(output_path, image_data)
+    logger.info("Saved generated image to: %s", output_path)
+    await save_state(context, "craiyon")
+    return True
+
+async def craiyon_image_automation(output_dir=None, prompt=None, context=None):
     """Main automation function for Craiyon image generation"""
     
     # Set up paths with defaults
-    if output_dir is None:
-        output_dir = Path("./data/output")
-    else:
-        output_dir = Path(output_dir)
-    
-    output_file = output_dir / "craiyon-altered.jpg"
+    output_dir = Path(output_dir or DEFAULT_OUTDIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
     
     if prompt is None:
         prompt = "A peaceful Japanese garden with cherry blossoms and a small pond, watercolor style"
     
-    async with async_playwright() as p:
-        # Launch browser with stealth settings
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--no-first-run',
-                '--no-default-browser-check',
-                '--disable-extensions',
-                '--disable-plugins',
-                '--disable-default-apps'
-            ]
-        )
-        
-        # Create context with realistic settings
-        context = await browser.new_context(
-            user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            viewport={'width': 1920, 'height': 1080},
-            extra_http_headers={
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1'
-            }
-        )
+    async with AsyncExitStack() as stack:
+        if context is None:
+            # Open a private context on the shared browser
+            context = await new_context(
+                site="craiyon",
+                extra_http_headers={
+                    'Accept-Language': 'en-US,en;q=0.9',
+                    'Accept-Encoding': 'gzip, deflate, br',
+                    'Connection': 'keep-alive',
+                    'Upgrade-Insecure-Requests': '1'
+                }
+            )
+            stack.push_async_callback(context.close)
         
         page = await context.new_page()
         
         try:
-            logging.info("Navigating to Craiyon")
-            await page.goto("https://www.craiyon.com/", timeout=60000)
-            
-            # Wait for page to load
-            await asyncio.sleep(5)
-            
-            # Look for the prompt input
-            logging.info("Looking for prompt input")
-            input_selectors = [
-                'input[placeholder*="Enter a prompt"]',
-                'textarea[placeholder*="prompt"]',
-                'input[type="text"]',
-                'textarea',
-                '#prompt-input',
-                '.prompt-input'
-            ]
-            
-            input_field = None
-            for selector in input_selectors:
-                try:
-                    input_field = await page.wait_for_selector(selector, timeout=10000)
-                    if input_field:
-                        logging.info(f"Found input field: {selector}")
-                        break
-                except:
-                    continue
-            
-            if input_field:
-                # Enter the prompt
-                logging.info(f"Entering prompt: {prompt}")
-                
-                await input_field.click()
-                await asyncio.sleep(1)
-                await input_field.fill(prompt)
-                await asyncio.sleep(2)
-                
-                # Look for generate button
-                generate_selectors = [
-                    'button:has-text("DRAW")',
-                    'button:has-text("Generate")',
-                    'button:has-text("Create")',
-                    'button[type="submit"]',
-                    'input[type="submit"]',
-                    '.generate-btn'
-                ]
-                
-                generate_button = None
-                for selector in generate_selectors:
-                    try:
-                        generate_button = await page.wait_for_selector(selector, timeout=5000)
-                        if generate_button:
-                            logging.info(f"Found generate button: {selector}")
-                            break
-                    except:
-                        continue
-                
-                if generate_button:
-                    logging.info("Clicking generate button")
-                    await generate_button.click()
-                    
-                    # Wait for generation to complete
-                    logging.info("Waiting for image generation")
-                    await asyncio.sleep(30)  # Craiyon can take time
-                    
-                    # Look for generated images
-                    image_selectors = [
-                        'img[src*="craiyon"]',
-                        'img[src*="generated"]',
-                        'img[alt*="Generated"]',
-                        '.generated-image img',
-                        '.result img',
-                        'img[data-testid*="result"]'
-                    ]
-                    
-                    generated_images = []
-                    for selector in image_selectors:
-                        try:
-                            images = await page.query_selector_all(selector)
-                            if images:
-                                logging.info(f"Found {len(images)} images with selector: {selector}")
-                                generated_images.extend(images)
-                                break
-                        except:
-                            continue
-                    
-                    if generated_images:
-                        # Try to download the first generated image
-                        for i, img in enumerate(generated_images[:3]):  # Try first 3 images
-                            try:
-                                img_src = await img.get_attribute('src')
-                                if img_src and not img_src.startswith('data:'):
-                                    logging.info(f"Attempting to download image {i+1}: {img_src}")
-                                    
-                                    # Handle relative URLs
-                                    if img_src.startswith('/'):
-                                        img_src = f"https://www.craiyon.com{img_src}"
-                                    elif not img_src.startswith('http'):
-                                        img_src = f"https://www.craiyon.com/{img_src}"
-                                    
-                                    # Download the image
-                                    response = await context.request.get(img_src)
-                                    if response.status == 200:
-                                        image_data = await response.body()
-                                        if len(image_data) > 1000:  # Ensure it's not a placeholder
-                                            output_path = output_dir / f"craiyon-altered-{i+1}.jpg"
-                                            with open(output_path, 'wb') as f:
-                                                f.write(image_data)
-                                            logging.info(f"Saved generated image to: {output_path}")
-                                            return True
-                                    else:
-                                        logging.error(f"Failed to download image {i+1}: HTTP {response.status}")
-                                else:
-                                    logging.warning(f"Skipping image {i+1}: data URL or empty src")
-                            except Exception as e:
-                                logging.error(f"Error downloading image {i+1}: {e}")
-                                continue
-                        
-                        logging.error("Could not download any generated images")
-                    else:
-                        logging.warning("No generated images found")
-                        await page.screenshot(path="./debug/craiyon_no_result.png")
-                else:
-                    logging.error("No generate button found")
-                    await page.screenshot(path="./debug/craiyon_no_button.png")
-            else:
-                logging.error("Could not find input field")
-                await page.screenshot(path="./debug/craiyon_no_input.png")
+            session = await open_session(page)
+            if session is None:
+                return False
+            return await submit(session, prompt, output_dir)
                 
         except Exception as e:
-            logging.error(f"Error during automation: {e}")
-            await page.screenshot(path="./debug/craiyon_error.png")
+            logger.error("Error during automation: %s", e)
+            await debug_screenshot(page, "craiyon_error")
             return False
         
         finally:
-            await browser.close()
-    
-    return False
+            await page.close()
 
 if __name__ == "__main__":
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    success = asyncio.run(craiyon_image_automation())
-    if success:
-        logging.info("Craiyon automation completed successfully")
-    else:
-        logging.error("Craiyon automation failed")
\ No newline at end of file
+    listener = setup_logging()
+    try:
+        success = asyncio.run(run_with_browser(craiyon_image_automation))
+        if success:
+            logger.info("Craiyon automation completed successfully")
+        else:
+            logger.error("Craiyon automation failed")
+    finally:
+        stop_logging(listener)
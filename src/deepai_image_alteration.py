@@ -1,169 +1,181 @@
 #!/usr/bin/env python3
 """
-DeepAI Text to Image 
+DeepAI Text to Image
 Simplified automation focusing on core functionality
+
+The candidate DeepAI pages are tried at the same time, each in its own
+context, and the first one to save an image wins.
 """
 
 import asyncio
+import base64
 import os
 import time
 import logging
+from contextlib import AsyncExitStack
 from pathlib import Path
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, expect
 
-async def deepai_retry_automation(output_dir=None, prompt=None):
-    """Retry DeepAI with improved selectors"""
-    
-    if output_dir is None:
-        data_dir = Path("./data/output")
-    else:
-        data_dir = Path(output_dir)
-    
-    if prompt is None:
-        prompt = "A robot painting a masterpiece in an art studio"
+from .automation_utils import block_resources, find_first, goto_commit, first_success, retry_async, save_bytes
+from .browser_pool import new_context, run_with_browser
+
+DEEPAI_URLS = [
+    "https://deepai.org/machine-learning-model/text2img",
+    "https://deepai.org/machine-learning-model/cute-creature-generator",
+    "https://deepai.org/"
+]
+
+# Candidate selectors per step, most specific first
+INPUT_SELECTORS = (
+    'textarea[name="text"]',
+    'textarea[placeholder*="Enter"]',
+    'input[name="text"]',
+    'textarea',
+    'input[type="text"]',
+    '#text-input'
+)
+SUBMIT_SELECTORS = (
+    'input[value*="Generate"]',
+    'button:has-text("Generate")',
+    'input[type="submit"]',
+    'button[type="submit"]',
+    '#generate-button',
+    'button:has-text("Submit")'
+)
+RESULT_SELECTORS = (
+    'img[src*="deepai"]',
+    'img[id*="output"]',
+    '#output img',
+    '.result-image img',
+    'img[alt*="Generated"]'
+)
+# Joined once at import; one query covers every candidate for a step
+INPUT_SELECTOR = ", ".join(INPUT_SELECTORS)
+SUBMIT_SELECTOR = ", ".join(SUBMIT_SELECTORS)
+RESULT_SELECTOR = ", ".join(RESULT_SELECTORS)
+
+# src attributes of the first two matches, as written in the markup
+FIRST_SOURCES_JS = "sel => Array.from(document.querySelectorAll(sel)).slice(0, 2).map(img => img.getAttribute('src'))"
+
+async def _try_url(url, prompt, context=None):
+    """Generate an image on one DeepAI page; returns (file name, bytes) on success, None otherwise.
+
+    Nothing is written here: the workers race, so only the winner's bytes are saved.
+    """
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
-        )
-        
-        context = await browser.new_context(
-            user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            viewport={'width': 1920, 'height': 1080}
-        )
+    async with AsyncExitStack() as stack:
+        if context is None:
+            # Each candidate page gets its own context on the shared browser; raced, so never HAR-recorded
+            context = await new_context(site="deepai", record_har=False)
+            stack.push_async_callback(context.close)
         
         page = await context.new_page()
+        # Skip ads, fonts and decorative images until a prompt is submitted
+        block_handler = await block_resources(page)
         
         try:
-            deepai_urls = [
-                "https://deepai.org/machine-learning-model/text2img",
-                "https://deepai.org/machine-learning-model/cute-creature-generator",
-                "https://deepai.org/"
-            ]
+            logging.info(f"Trying DeepAI: {url}")
+            # Stop waiting once the page commits (timeouts are retried too); the input wait below gates interaction
+            try:
+                await retry_async(lambda: goto_commit(page, url, raise_on_timeout=True))
+            except PlaywrightTimeoutError:
+                logging.warning("DeepAI navigation did not commit in time, waiting for the page anyway")
             
-            for url in deepai_urls:
-                try:
-                    logging.info(f"Trying DeepAI: {url}")
-                    await page.goto(url, timeout=30000)
-                    await asyncio.sleep(6)
-                    
-                    # Look for text input area
-                    input_selectors = [
-                        'textarea[name="text"]',
-                        'textarea[placeholder*="Enter"]',
-                        'input[name="text"]',
-                        'textarea',
-                        'input[type="text"]',
-                        '#text-input'
-                    ]
+            selector, input_field = await find_first(page, INPUT_SELECTORS, timeout=15000, cache_key=("deepai", "input"), union=INPUT_SELECTOR)
+            if input_field:
+                logging.info(f"Found input: {selector}")
+            
+            if input_field:
+                logging.info(f"Entering: {prompt}")
+                
+                await input_field.click()
+                await input_field.fill(prompt)
+                await expect(page.locator(selector).first).to_have_value(prompt, timeout=5000)
+                
+                selector, submit_btn = await find_first(page, SUBMIT_SELECTORS, timeout=5000, cache_key=("deepai", "submit"), union=SUBMIT_SELECTOR)
+                if submit_btn:
+                    logging.info(f"Found submit: {selector}")
+                    logging.info("Waiting for generation")
+                    # Let the result image through but keep trackers blocked
+                    await page.unroute("**/*", block_handler)
+                    await block_resources(page, resource_types=())
                     
-                    input_field = None
-                    for selector in input_selectors:
-                        try:
-                            input_field = await page.wait_for_selector(selector, timeout=8000)
-                            if input_field:
-                                logging.info(f"Found input: {selector}")
-                                break
-                        except:
-                            continue
+                    # Return as soon as the generation API answers instead of a fixed delay
+                    try:
+                        async with page.expect_response(
+                            lambda r: r.status == 200 and ('api.deepai.org' in r.url or '/api/' in r.url),
+                            timeout=30000
+                        ):
+                            await retry_async(submit_btn.click)
+                    except PlaywrightTimeoutError:
+                        logging.warning("Timed out waiting for the generation response")
                     
-                    if input_field:
-                        logging.info(f"Entering: {prompt}")
-                        
-                        await input_field.click()
-                        await asyncio.sleep(1)
-                        await input_field.fill(prompt)
-                        await asyncio.sleep(2)
-                        
-                        # Look for generate/submit button
-                        submit_selectors = [
-                            'input[value*="Generate"]',
-                            'button:has-text("Generate")',
-                            'input[type="submit"]',
-                            'button[type="submit"]',
-                            '#generate-button',
-                            'button:has-text("Submit")'
-                        ]
-                        
-                        for selector in submit_selectors:
-                            try:
-                                submit_btn = await page.wait_for_selector(selector, timeout=5000)
-                                if submit_btn:
-                                    logging.info(f"Found submit: {selector}")
-                                    await submit_btn.click()
-                                    logging.info("Waiting for generation")
-                                    await asyncio.sleep(20)
-                                    
-                                    # Look for result images
-                                    result_selectors = [
-                                        'img[src*="deepai"]',
-                                        'img[id*="output"]',
-                                        '#output img',
-                                        '.result-image img',
-                                        'img[alt*="Generated"]'
-                                    ]
-                                    
-                                    for img_sel in result_selectors:
-                                        try:
-                                            images = await page.query_selector_all(img_sel)
-                                            if images:
-                                                logging.info(f"Found {len(images)} images")
-                                                
-                                                for i, img in enumerate(images[:2]):
-                                                    img_src = await img.get_attribute('src')
-                                                    if img_src:
-                                                        logging.info(f"Image {i+1}: {img_src[:100]}")
-                                                        
-                                                        if img_src.startswith('data:image'):
-                                                            # Handle data URL
-                                                            import base64
-                                                            header, data = img_src.split(',', 1)
-                                                            image_data = base64.b64decode(data)
-                                                            if len(image_data) > 5000:
-                                                                output_path = data_dir / f"deepai-retry-{i+1}.png"
-                                                                with open(output_path, 'wb') as f:
-                                                                    f.write(image_data)
-                                                                logging.info(f"SUCCESS! Saved: {output_path}")
-                                                                return True
-                                                        else:
-                                                            # Handle regular URL
-                                                            if img_src.startswith('/'):
-                                                                img_src = f"https://deepai.org{img_src}"
-                                                            elif not img_src.startswith('http'):
-                                                                img_src = f"https://deepai.org/{img_src}"
-                                                            
-                                                            response = await context.request.get(img_src)
-                                                            if response.status == 200:
-                                                                image_data = await response.body()
-                                                                if len(image_data) > 5000:
-                                                                    output_path = data_dir / f"deepai-retry-{i+1}.jpg"
-                                                                    with open(output_path, 'wb') as f:
-                                                                        f.write(image_data)
-                                                                    logging.info(f"SUCCESS! Saved: {output_path}")
-                                                                    return True
-                                                break
-                                        except:
-                                            continue
-                                    break
-                            except:
-                                continue
-                        
-                        # Found interface, break URL loop
-                        break
-                        
-                except Exception as e:
-                    logging.error(f"Error with {url}: {e}")
-                    continue
+                    # Read the first two result sources in the page with a single round-trip
+                    img_srcs = await page.evaluate(FIRST_SOURCES_JS, RESULT_SELECTOR)
+                    if img_srcs:
+                        logging.info(f"Found {len(img_srcs)} images")
                     
+                    for i, img_src in enumerate(img_srcs):
+                        if img_src:
+                            logging.info(f"Image {i+1}: {img_src[:100]}")
+                            
+                            if img_src.startswith('data:image'):
+                                # Handle data URL
+                                # Decode from just past the header comma instead of splitting the whole string
+                                comma = img_src.index(',')
+                                image_data = base64.b64decode(img_src[comma + 1:], validate=False)
+                                if len(image_data) > 5000:
+                                    return f"deepai-retry-{i+1}.png", image_data
+                            else:
+                                # Handle regular URL
+                                if img_src.startswith('/'):
+                                    img_src = f"https://deepai.org{img_src}"
+                                elif not img_src.startswith('http'):
+                                    img_src = f"https://deepai.org/{img_src}"
+                                
+                                response = await context.request.get(img_src)
+                                if response.status == 200:
+                                    image_data = await response.body()
+                                    if len(image_data) > 5000:
+                                        return f"deepai-retry-{i+1}.jpg", image_data
+        
         except Exception as e:
-            logging.error(f"General error: {e}")
-            return False
+            logging.error(f"Error with {url}: {e}")
         
         finally:
-            await browser.close()
+            await page.close()
+    
+    return None
+
+async def deepai_retry_automation(output_dir=None, prompt=None, context=None):
+    """Retry DeepAI with improved selectors"""
+    
+    if output_dir is None:
+        data_dir = Path("./data/output")
+    else:
+        data_dir = Path(output_dir)
+    
+    if prompt is None:
+        prompt = "A robot painting a masterpiece in an art studio"
+    
+    # Race every candidate page; the first usable image cancels the others.
+    # A supplied context is shared by the workers, each on its own page.
+    try:
+        result = await first_success(_try_url(url, prompt, context) for url in DEEPAI_URLS)
+    except Exception as e:
+        logging.error(f"General error: {e}")
+        return False
+    
+    if result is None:
+        return False
     
-    return False
+    # Only the winner is written, once the race is over
+    name, image_data = result
+    data_dir.mkdir(parents=True, exist_ok=True)
+    output_path = data_dir / name
+    await save_bytes(output_path, image_data)
+    logging.info(f"SUCCESS! Saved: {output_path}")
+    return True
 
 if __name__ == "__main__":
     logging.basicConfig(
@@ -171,8 +183,8 @@ if __name__ == "__main__":
         format='%(asctime)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    success = asyncio.run(deepai_retry_automation())
+    success = asyncio.run(run_with_browser(deepai_retry_automation))
     if success:
         logging.info("DeepAI retry completed successfully")
     else:
-        logging.error("DeepAI retry failed")
\ No newline at end of file
+        logging.error("DeepAI retry failed")
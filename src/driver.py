@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Shared Browser Chat Driver
+One navigate -> prompt -> submit -> wait -> scrape loop for chat sites whose
+automations differ only in URLs and selectors:
+1. ProviderSpec holds everything site-specific
+2. BrowserChatDriver runs the loop for a spec, with the prompt cache,
+   resource blocking, a shared selector budget and PW_DEBUG_SHOTS failure screenshots
+"""
+
+import logging
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError, expect
+
+from . import prompt_cache
+from .automation_utils import (
+    BLOCKED_RESOURCE_TYPES, TRIMMED_TEXT_JS, SelectorBudget,
+    block_resources, debug_screenshot, find_first, retry_async, save_text, wait_for_stable_text
+)
+from .browser_pool import new_persistent_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTDIR = Path("./data/output")
+
+# How long a submit may take to show: the input clearing or detaching, or a new reply element
+SUBMIT_CHECK_MS = 3000
+SUBMITTED_JS = """([el, sel, n]) => !el.isConnected
+    || !(el.isContentEditable ? el.innerText : el.value).trim()
+    || document.querySelectorAll(sel).length > n"""
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """Everything that differs between two chat sites"""
+    site: str                      # Key for the prompt cache, selector cache and browser profile
+    name: str                      # Display name, also written into the output file
+    url: str
+    input_selectors: tuple         # Candidate selectors per step, most specific first
+    submit_selectors: tuple        # Fallback when Enter in the input does not submit
+    stream_selector: str           # Element whose text grows while the reply streams in
+    output_name: str
+    default_prompt: str
+    min_len: int = 50              # Shorter captures are treated as no reply
+    reply_position: str = "last"   # Which stream_selector match holds the reply: "first" or "last"
+    login_selectors: tuple = ()    # Shown when the site wants a login; only logged
+    blocked_types: frozenset = BLOCKED_RESOURCE_TYPES
+    response_wait_ms: int = 60000
+    context_options: dict = field(default_factory=dict)
+    # CSS unions of the candidate lists above, joined once when the spec is built
+    input_union: str = field(init=False, repr=False)
+    submit_union: str = field(init=False, repr=False)
+    login_union: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "input_union", ", ".join(self.input_selectors))
+        object.__setattr__(self, "submit_union", ", ".join(self.submit_selectors))
+        object.__setattr__(self, "login_union", ", ".join(self.login_selectors))
+
+class BrowserChatDriver:
+    """Runs one ProviderSpec's chat flow on a page"""
+
+    def __init__(self, spec):
+        self.spec = spec
+
+    async def save_response(self, output_file, prompt, text_content):
+        """Write the prompt and the reply to the output file"""
+        await save_text(output_file, (
+            f"Prompt: {prompt}\n\n"
+            f"Response from {self.spec.name}:\n"
+            f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            f"{text_content.strip()}"
+        ))
+
+    async def serve_cached(self, prompt=None, output_dir=None):
+        """Save a cached reply for the prompt without touching the browser; returns False on a miss"""
+        spec = self.spec
+        if prompt is None:
+            prompt = spec.default_prompt
+        cached = prompt_cache.get(spec.site, prompt)
+        if cached is None:
+            return False
+        output_dir = Path(output_dir or DEFAULT_OUTDIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_file = output_dir / spec.output_name
+        await self.save_response(output_file, prompt, cached)
+        logger.info("Saved cached response to: %s", output_file)
+        return True
+
+    async def run(self, prompt=None, output_dir=None, context=None):
+        """Submit a prompt and save the reply; returns True on success.
+
+        Without a context, the site's persistent browser profile is used.
+        """
+        spec = self.spec
+        output_dir = Path(output_dir or DEFAULT_OUTDIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_file = output_dir / spec.output_name
+        if prompt is None:
+            prompt = spec.default_prompt
+
+        # A prompt answered before is served from the cache without opening a page
+        if await self.serve_cached(prompt, output_dir):
+            return True
+
+        async with AsyncExitStack() as stack:
+            if context is None:
+                # Standalone runs reuse the site's on-disk profile for a warm start
+                context = await new_persistent_context(spec.site, bypass_csp=True, **spec.context_options)
+                stack.push_async_callback(context.close)
+
+            page = await context.new_page()
+            # Only text is read back, so skip heavy assets and trackers for the whole run
+            await block_resources(page, resource_types=spec.blocked_types)
+
+            try:
+                return await self._converse(page, prompt, output_file)
+            except Exception as e:
+                logger.error("Error during %s automation: %s", spec.name, e)
+                await debug_screenshot(page, f"{spec.site}_error")
+                return False
+            finally:
+                await page.close()
+
+    async def _submitted(self, page, input_field, previous):
+        """Whether the prompt was sent: the input emptied or went away, or a reply element was added"""
+        try:
+            await page.wait_for_function(
+                SUBMITTED_JS, arg=[input_field, self.spec.stream_selector, previous], timeout=SUBMIT_CHECK_MS
+            )
+            return True
+        except PlaywrightTimeoutError:
+            return False
+        except PlaywrightError:
+            # The page navigated away (e.g. to a results URL), which only a submit does
+            return True
+
+    async def _converse(self, page, prompt, output_file):
+        """Navigate, submit the prompt and capture the reply on an open page"""
+        spec = self.spec
+
+        logger.info("Navigating to %s", spec.name)
+        # Dropped connections, timeouts and 5xx pages are retried with backoff
+        await retry_async(lambda: page.goto(spec.url, timeout=60000, wait_until='domcontentloaded'))
+
+        # Every selector wait below draws from one budget instead of its own timeout
+        budget = SelectorBudget()
+
+        if spec.login_selectors:
+            # All candidates share one short wait
+            try:
+                await page.wait_for_selector(spec.login_union, timeout=budget.remaining(cap=3000))
+                logger.warning("Login required for %s - trying guest mode or alternative", spec.name)
+            except PlaywrightTimeoutError:
+                pass
+
+        logger.info("Looking for chat input")
+        selector, input_field = await find_first(
+            page, spec.input_selectors, timeout=budget.remaining(), cache_key=(spec.site, "input"),
+            union=spec.input_union
+        )
+        if not input_field:
+            # A composer that never rendered usually shows up after one reload, with a fresh budget
+            logger.warning("No chat input yet, reloading %s", spec.name)
+            await retry_async(lambda: page.reload(timeout=60000, wait_until='domcontentloaded'))
+            budget = SelectorBudget()
+            selector, input_field = await find_first(
+                page, spec.input_selectors, timeout=budget.remaining(), cache_key=(spec.site, "input"),
+                union=spec.input_union
+            )
+        if not input_field:
+            logger.error("Could not find input field")
+            await debug_screenshot(page, f"{spec.site}_no_input")
+            return False
+        logger.info("Found input field: %s", selector)
+
+        logger.info("Entering prompt: %s", prompt)
+        await input_field.click()
+        await input_field.fill(prompt)
+        input_locator = page.locator(selector).first
+        if await input_field.evaluate("el => el.isContentEditable"):
+            await expect(input_locator).to_have_text(prompt, timeout=5000)
+        else:
+            await expect(input_locator).to_have_value(prompt, timeout=5000)
+
+        # Both composers submit on Enter: one key event instead of probing for the send button.
+        # Enter does not fail when it only inserts a newline, so check that the prompt left
+        previous = await page.locator(spec.stream_selector).count()
+        try:
+            await input_field.press("Enter")
+            submitted = await self._submitted(page, input_field, previous)
+        except PlaywrightError:
+            submitted = False
+        if not submitted:
+            logger.warning("Enter did not submit, clicking the submit button")
+            try:
+                await page.locator(spec.submit_union).first.click(timeout=budget.remaining())
+            except PlaywrightError:
+                logger.error("No submit button found")
+                await debug_screenshot(page, f"{spec.site}_no_submit")
+                return False
+
+        # Wait for a new reply to appear, then for it to stop streaming
+        logger.info("Waiting for %s response", spec.name)
+        if not await wait_for_stable_text(page, spec.stream_selector, appear_timeout=spec.response_wait_ms, previous=previous):
+            logger.warning("%s response not complete, capturing what is available", spec.name)
+
+        # Read the reply's rendered text and its length in one round-trip
+        matches = page.locator(spec.stream_selector)
+        reply = matches.first if spec.reply_position == "first" else matches.last
+        try:
+            length, text_content = await reply.evaluate(TRIMMED_TEXT_JS, timeout=30000)
+        except PlaywrightTimeoutError:
+            length, text_content = 0, None
+
+        if length <= spec.min_len:
+            logger.warning("No response found")
+            await debug_screenshot(page, f"{spec.site}_no_response")
+            return False
+
+        logger.info("Captured %s response (%s chars)", spec.name, length)
+        # Save response to file and remember it for the next run
+        await self.save_response(output_file, prompt, text_content)
+        prompt_cache.put(spec.site, prompt, text_content)
+        logger.info("Saved response to: %s", output_file)
+        return True
@@ -11,10 +11,35 @@ import asyncio
 import os
 import time
 import logging
+from contextlib import AsyncExitStack
 from pathlib import Path
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError, expect
 
-async def gemini_chat_automation(output_dir=None, prompt=None):
+from .automation_utils import block_resources, find_first, goto_commit, retry_async, save_text, wait_for_stable_text
+from .browser_pool import new_context, run_with_browser
+
+# Candidate selectors per step, most specific first
+INPUT_SELECTORS = (
+    'div[contenteditable="true"]',
+    'textarea[placeholder*="Enter"]',
+    'textarea[aria-label*="Message"]',
+    'textarea',
+    'input[type="text"]'
+)
+SEND_SELECTORS = (
+    'button[aria-label*="Send"]',
+    'button:has-text("Send")',
+    'button[type="submit"]',
+    '[data-testid="send-button"]',
+    'button[data-test-id="send-button"]'
+)
+# Joined once at import; one query covers every candidate for a step
+INPUT_SELECTOR = ", ".join(INPUT_SELECTORS)
+SEND_SELECTOR = ", ".join(SEND_SELECTORS)
+# One match per model turn; broader containers such as [role="presentation"] exist before any reply
+REPLY_SELECTOR = '.model-response, [data-response-index]'
+
+async def gemini_chat_automation(output_dir=None, prompt=None, context=None):
     """Main automation function for Google Gemini"""
     
     # Set up paths with defaults
@@ -22,136 +47,84 @@ async def gemini_chat_automation(output_dir=None, prompt=None):
         output_dir = Path("./data/output")
     else:
         output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
     
     if prompt is None:
         prompt = "Explain the benefits and challenges of renewable energy sources"
     
     output_file = output_dir / "gemini-text-completion.txt"
     
-    async with async_playwright() as p:
-        # Launch browser with stealth settings
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                '--no-sandbox',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--no-first-run',
-                '--no-default-browser-check'
-            ]
-        )
-        
-        context = await browser.new_context(
-            user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            viewport={'width': 1920, 'height': 1080}
-        )
+    async with AsyncExitStack() as stack:
+        if context is None:
+            # Open a private context on the shared browser
+            context = await new_context(site="gemini")
+            stack.push_async_callback(context.close)
         
         page = await context.new_page()
+        # Only text is read back, so skip images, fonts and trackers for the whole run
+        await block_resources(page)
         
         try:
             logging.info("Navigating to Google Gemini")
-            await page.goto("https://gemini.google.com/", timeout=60000)
-            
-            # Wait for page to load
-            await asyncio.sleep(5)
+            # Stop waiting once the page commits (timeouts are retried too); the input wait below gates interaction
+            try:
+                await retry_async(lambda: goto_commit(page, "https://gemini.google.com/", raise_on_timeout=True))
+            except PlaywrightTimeoutError:
+                logging.warning("Gemini navigation did not commit in time, waiting for the page anyway")
             
             # Look for chat interface
             logging.info("Looking for chat input")
-            input_selectors = [
-                'div[contenteditable="true"]',
-                'textarea[placeholder*="Enter"]',
-                'textarea[aria-label*="Message"]',
-                'textarea',
-                'input[type="text"]'
-            ]
-            
-            input_field = None
-            for selector in input_selectors:
-                try:
-                    input_field = await page.wait_for_selector(selector, timeout=10000)
-                    if input_field:
-                        logging.info(f"Found input field: {selector}")
-                        break
-                except:
-                    continue
+            selector, input_field = await find_first(page, INPUT_SELECTORS, timeout=20000, cache_key=("gemini", "input"), union=INPUT_SELECTOR)
+            if input_field:
+                logging.info(f"Found input field: {selector}")
             
             if input_field:
                 # Enter the prompt
                 logging.info(f"Entering prompt: {prompt}")
                 
                 await input_field.click()
-                await asyncio.sleep(1)
                 await input_field.fill(prompt)
-                await asyncio.sleep(2)
-                
-                # Look for send button
-                send_selectors = [
-                    'button[aria-label*="Send"]',
-                    'button:has-text("Send")',
-                    'button[type="submit"]',
-                    '[data-testid="send-button"]',
-                    'button[data-test-id="send-button"]'
-                ]
+                input_locator = page.locator(selector).first
+                if await input_field.evaluate("el => el.isContentEditable"):
+                    await expect(input_locator).to_have_text(prompt, timeout=5000)
+                else:
+                    await expect(input_locator).to_have_value(prompt, timeout=5000)
                 
-                send_button = None
-                for selector in send_selectors:
-                    try:
-                        send_button = await page.wait_for_selector(selector, timeout=5000)
-                        if send_button:
-                            logging.info(f"Found send button: {selector}")
-                            break
-                    except:
-                        continue
+                selector, send_button = await find_first(page, SEND_SELECTORS, timeout=5000, cache_key=("gemini", "send"), union=SEND_SELECTOR)
+                if send_button:
+                    logging.info(f"Found send button: {selector}")
                 
                 if send_button:
+                    # Replies already on the page must not satisfy the wait below
+                    previous = await page.locator(REPLY_SELECTOR).count()
                     logging.info("Clicking send button")
-                    await send_button.click()
+                    await retry_async(send_button.click)
                     
-                    # Wait for response
+                    # Wait for a new reply to appear, then for its text to stop streaming
                     logging.info("Waiting for Gemini response")
-                    await asyncio.sleep(15)  # Gemini can take time
+                    if not await wait_for_stable_text(page, REPLY_SELECTOR, appear_timeout=60000, settle_timeout=120000, previous=previous):
+                        logging.warning("Gemini response not complete, capturing what is available")
                     
-                    # Look for response elements
-                    response_selectors = [
-                        '[data-response-index]',
-                        '.model-response',
-                        '[role="presentation"]',
-                        '.markdown-content',
-                        '.response-content'
-                    ]
+                    # Texts of the turns added by this prompt in one round-trip, skipping replies already on the page
+                    response_texts = (await page.locator(REPLY_SELECTOR).all_text_contents())[previous:]
+                    if response_texts:
+                        logging.info(f"Found {len(response_texts)} new response elements")
                     
-                    for selector in response_selectors:
-                        try:
-                            await asyncio.sleep(3)  # Wait for response completion
+                    # Document order puts the latest reply last
+                    for text_content in reversed(response_texts):
+                        if text_content and len(text_content.strip()) > 50:
+                            logging.info(f"Captured Gemini response ({len(text_content)} chars)")
+                            
+                            # Save response to file off the event loop
+                            await save_text(output_file, (
+                                f"Prompt: {prompt}\n\n"
+                                f"Response from Google Gemini:\n"
+                                f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+                                f"{text_content.strip()}"
+                            ))
                             
-                            response_elements = await page.query_selector_all(selector)
-                            if response_elements:
-                                logging.info(f"Found {len(response_elements)} response elements")
-                                
-                                # Get the last response
-                                for element in response_elements[-2:]:
-                                    try:
-                                        text_content = await element.text_content()
-                                        if text_content and len(text_content.strip()) > 50:
-                                            logging.info(f"Captured Gemini response ({len(text_content)} chars)")
-                                            
-                                            # Save response to file
-                                            with open(output_file, 'w', encoding='utf-8') as f:
-                                                f.write(f"Prompt: {prompt}\n\n")
-                                                f.write(f"Response from Google Gemini:\n")
-                                                f.write(f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                                                f.write(text_content.strip())
-                                            
-                                            logging.info(f"Saved response to: {output_file}")
-                                            return True
-                                    except Exception as e:
-                                        logging.error(f"Error extracting text: {e}")
-                                        continue
-                                break
-                        except Exception as e:
-                            logging.error(f"Error with selector {selector}: {e}")
-                            continue
+                            logging.info(f"Saved response to: {output_file}")
+                            return True
                     
                     logging.warning("No response found")
                     await page.screenshot(path="./debug/gemini_no_response.png")
@@ -168,7 +141,7 @@ async def gemini_chat_automation(output_dir=None, prompt=None):
             return False
         
         finally:
-            await browser.close()
+            await page.close()
     
     return False
 
@@ -178,7 +151,7 @@ if __name__ == "__main__":
         format='%(asctime)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    success = asyncio.run(gemini_chat_automation())
+    success = asyncio.run(run_with_browser(gemini_chat_automation))
     if success:
         logging.info("Gemini automation completed successfully")
     else:
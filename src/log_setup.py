@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Shared Logging Setup
+Configures logging for main.py and the standalone automation scripts:
+1. Log calls only enqueue records, so the event loop never waits on stderr
+2. A background QueueListener formats records and writes them to buffered stderr
+3. Stopping the listener drains the queue and flushes the stream
+
+setup_logging() is idempotent, so a script imported by another entry point
+that already set up logging does not add a second handler.
+"""
+
+import io
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_listener = None
+
+def setup_logging(level=logging.INFO) -> QueueListener:
+    """Queue log records and write them to buffered stderr from a background thread.
+
+    Returns the running listener unchanged when logging is already set up.
+    """
+    global _listener
+
+    if _listener is not None:
+        return _listener
+
+    stderr_buffer = getattr(sys.stderr, "buffer", None)
+    if stderr_buffer is not None:
+        stream = io.TextIOWrapper(stderr_buffer, encoding=sys.stderr.encoding,
+                                  errors="backslashreplace", write_through=False)
+    else:
+        stream = sys.stderr
+    
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+    
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+    
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+    return _listener
+
+def stop_logging(listener: QueueListener):
+    """Drain queued log records and flush buffered stderr"""
+    global _listener
+
+    listener.stop()
+    for handler in listener.handlers:
+        handler.flush()
+        if isinstance(handler.stream, io.TextIOWrapper) and handler.stream is not sys.stderr:
+            # Release sys.stderr.buffer without closing it
+            handler.stream.detach()
+    if listener is _listener:
+        for handler in logging.getLogger().handlers[:]:
+            if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+                logging.getLogger().removeHandler(handler)
+        _listener = None
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+OpenAI API Chat Completion
+Gets a ChatGPT completion without a browser:
+1. Reuse one AsyncOpenAI client for every call in the process
+2. Send the prompt to the chat completions endpoint
+3. Save the reply in the same format as the browser automation
+
+Needs the optional `openai` package and OPENAI_API_KEY in the environment;
+run_all falls back to the browser automation when either is missing.
+"""
+
+import asyncio
+import os
+import time
+import logging
+from pathlib import Path
+
+from .automation_utils import save_text
+from .log_setup import setup_logging, stop_logging
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:  # Optional: without the SDK only the browser automation is available
+    AsyncOpenAI = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTDIR = Path("./data/output")
+OUTPUT_NAME = "openai-text-completion.txt"
+MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+
+_client = None
+
+def api_available():
+    """Whether the SDK is installed and an API key is configured"""
+    return AsyncOpenAI is not None and bool(os.environ.get("OPENAI_API_KEY"))
+
+def _get_client():
+    """Return the process-wide client, creating it (and its connection pool) on first use"""
+    global _client
+    
+    if _client is None:
+        _client = AsyncOpenAI()
+    return _client
+
+async def openai_api_automation(output_dir=None, prompt=None, context=None):
+    """Complete a prompt through the OpenAI API; context is accepted for parity with the browser automations and unused"""
+    
+    output_dir = Path(output_dir or DEFAULT_OUTDIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    if prompt is None:
+        prompt = "Explain the concept of artificial intelligence in simple terms"
+    
+    output_file = output_dir / OUTPUT_NAME
+    
+    if not api_available():
+        logger.error("OpenAI API unavailable: install the openai package and set OPENAI_API_KEY")
+        return False
+    
+    try:
+        logger.info("Requesting completion from %s", MODEL)
+        response = await _get_client().chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}]
+        )
+    except Exception as e:
+        logger.error("OpenAI API request failed: %s", e)
+        return False
+    
+    text_content = response.choices[0].message.content if response.choices else None
+    if not text_content:
+        logger.warning("OpenAI API returned an empty completion")
+        return False
+    
+    await save_text(output_file, (
+        f"Prompt: {prompt}\n\n"
+        f"Response from OpenAI ChatGPT:\n"
+        f"Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        f"{text_content.strip()}"
+    ))
+    logger.info("Saved response to: %s", output_file)
+    return True
+
+if __name__ == "__main__":
+    listener = setup_logging()
+    try:
+        success = asyncio.run(openai_api_automation())
+        if success:
+            logger.info("OpenAI API completion completed successfully")
+        else:
+            logger.error("OpenAI API completion failed")
+    finally:
+        stop_logging(listener)
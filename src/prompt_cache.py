@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Prompt Response Cache
+Exact-match cache of prompt -> response text per provider, kept in SQLite so
+re-running a prompt (common while developing) skips the browser entirely.
+
+Keys are a 16-byte BLAKE2b digest of "provider|prompt". Pass --no-cache to
+main.py or run_all, or call disable(), to always drive the live service.
+"""
+
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+CACHE_PATH = Path("./data/prompt_cache.sqlite3")
+
+_enabled = True
+_connection = None
+
+def disable():
+    """Turn the cache off for the rest of the process: get() misses and put() is a no-op"""
+    global _enabled
+
+    _enabled = False
+
+def _connect():
+    """Open the cache database on first use, creating its table if needed"""
+    global _connection
+
+    if _connection is None:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _connection = sqlite3.connect(CACHE_PATH)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "prompt_hash BLOB PRIMARY KEY, provider TEXT NOT NULL, response TEXT NOT NULL, ts INTEGER NOT NULL)"
+        )
+    return _connection
+
+def _key(provider, prompt):
+    """Hash provider and prompt into the primary key"""
+    return hashlib.blake2b(f"{provider}|{prompt}".encode('utf-8'), digest_size=16).digest()
+
+def get(provider, prompt):
+    """Return the cached response for a provider and prompt, or None"""
+    if not _enabled:
+        return None
+    row = _connect().execute(
+        "SELECT response FROM responses WHERE prompt_hash = ?", (_key(provider, prompt),)
+    ).fetchone()
+    return row[0] if row else None
+
+def put(provider, prompt, response):
+    """Store a response, replacing any earlier one for the same provider and prompt"""
+    if not _enabled:
+        return
+    connection = _connect()
+    connection.execute(
+        "INSERT OR REPLACE INTO responses (prompt_hash, provider, response, ts) VALUES (?, ?, ?, ?)",
+        (_key(provider, prompt), provider, response, int(time.time()))
+    )
+    connection.commit()
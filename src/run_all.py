@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Concurrent Multi-Service Automation
+Runs several automations at once on the shared browser:
+1. Launch Chromium once through the browser pool
+2. Give each automation its own isolated BrowserContext
+3. Await them together so wall time is the slowest site, not the sum
+
+run_prompts() covers the batch case for one site: the page is opened once
+and every prompt is submitted on it without navigating again.
+
+Pick the sites from the command line, e.g.
+    python -m src.run_all --providers openai,perplexity --max-concurrency 2
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from . import bing_image_alteration, claude_chat_completion, craiyon_image_alteration, prompt_cache
+from .bing_image_alteration import bing_image_automation
+from .browser_pool import BrowserPool, new_context, run_with_browser
+from .claude_chat_completion import claude_chat_automation, claude_chat_fast_path
+from .craiyon_image_alteration import craiyon_image_automation
+from .deepai_image_alteration import deepai_retry_automation
+from .gemini_chat_completion import gemini_chat_automation
+from .log_setup import setup_logging, stop_logging
+from .openai_api_completion import api_available, openai_api_automation
+from .openai_chat_completion import openai_chat_automation, openai_chat_fast_path
+from .perplexity_chat_completion import perplexity_chat_automation, perplexity_chat_fast_path
+
+logger = logging.getLogger(__name__)
+
+async def _openai_fast_path(**kwargs):
+    """Serve a cached reply, else complete through the OpenAI API when a key is configured.
+
+    False sends the run to the ChatGPT page.
+    """
+    if await openai_chat_fast_path(**kwargs):
+        return True
+    return api_available() and await openai_api_automation(**kwargs)
+
+# Site name -> automation; the name also keys the site's saved storage state
+AUTOMATIONS = {
+    "bing": bing_image_automation,
+    "claude": claude_chat_automation,
+    "craiyon": craiyon_image_automation,
+    "deepai": deepai_retry_automation,
+    "gemini": gemini_chat_automation,
+    "openai": openai_chat_automation,
+    "perplexity": perplexity_chat_automation
+}
+
+# Sites run when no providers are named
+DEFAULT_PROVIDERS = ("bing", "claude", "craiyon")
+DEFAULT_AUTOMATIONS = {site: AUTOMATIONS[site] for site in DEFAULT_PROVIDERS}
+
+# Site name -> browserless attempt tried before a context is opened; True means the site is done
+FAST_PATHS = {
+    "claude": claude_chat_fast_path,
+    "openai": _openai_fast_path,
+    "perplexity": perplexity_chat_fast_path
+}
+
+# Site name -> module exposing open_session(page) and submit(session, prompt, output_dir)
+SESSION_MODULES = {
+    "bing": bing_image_alteration,
+    "claude": claude_chat_completion,
+    "craiyon": craiyon_image_alteration
+}
+
+async def _run_in_context(site, automation, pool, **kwargs):
+    """Run one automation in a fresh context once the pool has a free slot.
+
+    A site's fast path runs first, so a run it completes never launches the browser.
+    """
+    fast_path = FAST_PATHS.get(site)
+    if fast_path is not None and await fast_path(**kwargs):
+        return True
+    async with pool.context(site) as context:
+        return await automation(context=context, **kwargs)
+
+async def run_all(automations=None, max_concurrency=None, **kwargs):
+    """Run automations concurrently, each in its own context on the shared browser.
+
+    Returns a dict of site name -> success.
+    """
+    if automations is None:
+        automations = DEFAULT_AUTOMATIONS
+    # Created once here so no automation (or cache hit) fails on its first write
+    Path(kwargs.get("output_dir") or "./data/output").mkdir(parents=True, exist_ok=True)
+
+    pool = BrowserPool(max_concurrency or len(automations))
+    results = await asyncio.gather(
+        *(_run_in_context(site, automation, pool, **kwargs) for site, automation in automations.items()),
+        return_exceptions=True
+    )
+
+    for site, result in zip(automations, results):
+        if isinstance(result, BaseException):
+            logger.error("Error running %s: %s", site, result)
+    return {site: result is True for site, result in zip(automations, results)}
+
+async def run_prompts(site, prompts, output_dir=None):
+    """Submit several prompts to one site on a single page, saving each under output_dir/prompt-N.
+
+    Returns a success flag per prompt.
+    """
+    module = SESSION_MODULES[site]
+    output_dir = Path(output_dir or "./data/output")
+    context = await new_context(site=site)
+    try:
+        page = await context.new_page()
+        session = await module.open_session(page)
+        if session is None:
+            return [False] * len(prompts)
+
+        results = []
+        for index, prompt in enumerate(prompts, 1):
+            prompt_dir = output_dir / f"prompt-{index}"
+            prompt_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                results.append(await module.submit(session, prompt, prompt_dir))
+            except Exception as e:
+                logger.error("Error submitting prompt %s to %s: %s", index, site, e)
+                results.append(False)
+        return results
+    finally:
+        await context.close()
+
+def parse_args(argv=None):
+    """Parse the command line for a concurrent run"""
+    parser = argparse.ArgumentParser(description="Run several automations concurrently on one shared browser")
+    parser.add_argument(
+        "--providers",
+        default=",".join(DEFAULT_PROVIDERS),
+        help=f"Comma-separated sites to run, from: {', '.join(AUTOMATIONS)} (default: {','.join(DEFAULT_PROVIDERS)})"
+    )
+    parser.add_argument("--prompt", "-p", help="Prompt sent to every site (default: each site's own)")
+    parser.add_argument("--output", "-o", help="Output directory (default: ./data/output)")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        help="Maximum number of browser contexts open at once (default: one per site)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always query the live services instead of reusing cached responses"
+    )
+
+    args = parser.parse_args(argv)
+    args.providers = [name.strip() for name in args.providers.split(",") if name.strip()]
+    unknown = [name for name in args.providers if name not in AUTOMATIONS]
+    if unknown or not args.providers:
+        parser.error(f"unknown providers: {', '.join(unknown) or '(none given)'}")
+    if args.max_concurrency is not None and args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args()
+    kwargs = {key: value for key, value in (("prompt", args.prompt), ("output_dir", args.output)) if value is not None}
+    automations = {site: AUTOMATIONS[site] for site in args.providers}
+    if args.no_cache:
+        prompt_cache.disable()
+
+    listener = setup_logging()
+    try:
+        results = asyncio.run(run_with_browser(
+            run_all, automations=automations, max_concurrency=args.max_concurrency, **kwargs
+        ))
+        for site, success in results.items():
+            if success:
+                logger.info("%s completed successfully", site)
+            else:
+                logger.error("%s failed", site)
+    finally:
+        stop_logging(listener)